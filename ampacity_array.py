@@ -0,0 +1,89 @@
+# ampacity_array.py
+# Dense categorical form of AMPACITY_DB (Tables B.2 - B.9) for vectorized lookups.
+# Every key dimension gets integer codes and the base ampacities live in one
+# contiguous array indexed by
+#   (insulation, conductor, core, install, armour, layout, section),
+# the section axis being the sections of the active table set.
+
+import numpy as np
+import compiled_tables
+from data_tables import AMPACITY_DB, VALID_SECTIONS
+
+# Category order of each AMPACITY_DB key dimension (code = position)
+DB_INSULATIONS = ["EPR", "XLPE"]
+DB_CONDUCTORS = ["Al", "Cu"]
+DB_CORE_TYPES = ["Single Core", "Three Core"]
+DB_INSTALLS = ["Direct", "Ducts", "Air"]
+DB_ARMOURS = ["Unarmoured", "Armoured"]
+DB_LAYOUTS = ["Trefoil", "Flat Spaced", "Flat Touching", "N/A"]
+
+DIMENSIONS = [DB_INSULATIONS, DB_CONDUCTORS, DB_CORE_TYPES, DB_INSTALLS, DB_ARMOURS, DB_LAYOUTS]
+SECTIONS = np.array(compiled_tables.TABLES.sections, dtype=float)
+
+MISSING = -1  # marks combinations / sections not tabulated in the standard
+
+def build_ampacity_array(db=AMPACITY_DB, sections=VALID_SECTIONS):
+    """
+    Dense int16 array of base ampacities (A) with MISSING where the
+    combination or section is not in db. Also returns the source table
+    name per combination (object array, None when missing).
+    """
+    shape = tuple(len(d) for d in DIMENSIONS)
+    amps = np.full(shape + (len(sections),), MISSING, dtype=np.int16)
+    sources = np.full(shape, None, dtype=object)
+    for key, record in db.items():
+        idx = tuple(dim.index(value) for dim, value in zip(DIMENSIONS, key))
+        sources[idx] = record["source"]
+        for s, value in enumerate(sections):
+            if value in record["data"]:
+                amps[idx + (s,)] = record["data"][value]
+    return amps, sources
+
+AMPACITY_ARRAY, AMPACITY_SOURCES = build_ampacity_array(compiled_tables.TABLES.ampacity, compiled_tables.TABLES.sections)
+
+def _load_tables(tables):
+    global AMPACITY_ARRAY, AMPACITY_SOURCES, SECTIONS
+    SECTIONS = np.array(tables.sections, dtype=float)
+    if tables.arrays is not None and "ampacity" in tables.arrays:
+        AMPACITY_ARRAY = tables.arrays["ampacity"]
+        _, AMPACITY_SOURCES = build_ampacity_array(tables.ampacity, sections=[])
+    else:
+        AMPACITY_ARRAY, AMPACITY_SOURCES = build_ampacity_array(tables.ampacity, tables.sections)
+
+compiled_tables.on_tables_changed(_load_tables)
+
+def db_codes(insulation, conductor, core, install, armour, layout):
+    """
+    Map batch (UI) codes to AMPACITY_ARRAY codes, vectorized.
+    Same mapping as calculations.get_ampacity_key: HEPR uses EPR values,
+    Single Core is always unarmoured and Three Core has no layout.
+    Inputs use the category orders of batch.INSULATIONS, CONDUCTORS,
+    CORE_TYPES, INSTALL_TYPES and LAYOUTS; armour is bool.
+    """
+    # batch.INSULATIONS = EPR, HEPR, XLPE
+    ins = np.array([0, 0, 1])[np.asarray(insulation)]
+    # batch.CONDUCTORS = Al, Cu (same order)
+    cond = np.asarray(conductor)
+    core = np.asarray(core)
+    # batch.INSTALL_TYPES = Directamente enterrado, Enterrado bajo tubo
+    inst = np.array([0, 1])[np.asarray(install)]
+    single = core == 0
+    arm = np.where(single, 0, np.asarray(armour, dtype=np.int64))
+    # batch.LAYOUTS = Trefoil, Flat spaced, Flat touching ducts
+    lay = np.where(single, np.array([0, 1, 2])[np.asarray(layout)], 3)
+    return ins, cond, core, inst, arm, lay
+
+def section_index(section):
+    """Index into SECTIONS and a mask of sections that are in SECTIONS."""
+    s = np.asarray(section, dtype=float)
+    si = np.minimum(np.searchsorted(SECTIONS, s), len(SECTIONS) - 1)
+    return si, SECTIONS[si] == s
+
+def lookup(ins, cond, core, inst, arm, lay, section):
+    """
+    Gather base ampacities for DB codes (see db_codes).
+    Returns float array with 0 where not tabulated, as get_base_iz.
+    """
+    si, valid = section_index(section)
+    amps = AMPACITY_ARRAY[ins, cond, core, inst, arm, lay, si]
+    return np.where(valid & (amps != MISSING), amps, 0).astype(float)
@@ -1,11 +1,11 @@
-
+import os
 import streamlit as st
-import pandas as pd
-import math
-from calculations import (
-    get_k1, get_k2, get_k3, get_k4, calculate_ib, interpolate_linear
-)
-from data_tables import AMPACITY_DB, VALID_SECTIONS, MAX_TEMPERATURES
+from streamlit.errors import StreamlitAPIException
+from engine import IncrementalEvaluator, DEFAULT_SECTION
+import instrumentation
+import compiled_tables
+# pandas and the NumPy-based modules (sizing) are imported where results are rendered
+from data_tables import VALID_SECTIONS, MAX_TEMPERATURES
 
 st.set_page_config(page_title="Cálculos MV IEC 60502", layout="wide", page_icon="⚡")
 
@@ -33,13 +33,43 @@ voltage_sys = st.sidebar.number_input("Tensión de Operación (kV)", value=30.0,
 frequency = st.sidebar.number_input("Frecuencia (Hz)", value=50.0, step=5.0)
 pf = st.sidebar.number_input("Factor de Potencia (FP)", value=0.9, max_value=1.0, step=0.01)
 oversizing = st.sidebar.number_input("Sobredimensionamiento (%) 📈", value=0.0, step=1.0)
+fault_ka = st.sidebar.number_input("Corriente de Cortocircuito (kA) 💥", value=20.0, step=1.0)
+durations_text = st.sidebar.text_input("Tiempos de Despeje (s) ⏲️", value="0.1, 0.5, 1.0")
+try:
+    fault_durations = [float(t) for t in durations_text.split(",") if t.strip()]
+except ValueError:
+    st.sidebar.error("Tiempos de despeje no válidos; use números separados por comas.")
+    fault_durations = []
+fault_durations = [t for t in fault_durations if t > 0]
+
+st.sidebar.header("🛠️ 3. Depuración")
+debug_timing = st.sidebar.checkbox("Medir tiempos por etapa ⏱️", value=False)
+debug_profile = st.sidebar.checkbox("Capturar cProfile al calcular 🔬", value=False)
+use_result_cache = st.sidebar.checkbox("Caché persistente de resultados 💾", value=bool(os.environ.get("AMPACITY_CACHE")),
+                                       help="Reutiliza entre sesiones los tramos ya calculados (ruta en AMPACITY_CACHE)")
+# Timings are kept per session: the recorder is only active in this session's script run
+if "recorder" not in st.session_state:
+    st.session_state.recorder = instrumentation.Recorder()
+instrumentation.activate(st.session_state.recorder if debug_timing else None)
 
 # Main Area - Circuit Definition
+LARGE_PROJECT_TRAMOS = 50  # large-project mode is on by default above this size
+CIRCUITS_PER_PAGE = 5
+
 st.header("📋 Definición de Circuitos y Tramos")
 
 if "circuits" not in st.session_state:
     st.session_state.circuits = []
 
+# Keeps per-tramo results between reruns; only changed tramos are recomputed
+if "evaluator" not in st.session_state:
+    st.session_state.evaluator = IncrementalEvaluator()
+if use_result_cache and st.session_state.evaluator.store is None:
+    from result_cache import ResultCache
+    st.session_state.evaluator.store = ResultCache()
+elif not use_result_cache:
+    st.session_state.evaluator.store = None
+
 # Helper functions for state management
 def add_circuit():
     st.session_state.circuits.append({"sections": []})
@@ -48,33 +78,59 @@ def remove_circuit(index):
     st.session_state.circuits.pop(index)
 
 def add_section(circuit_index):
-    st.session_state.circuits[circuit_index]["sections"].append({
-        "pb_power": 10120.0,
-        "install_type": "Directamente enterrado",
-        "insulation": "XLPE",
-        "section_mm2": 400,
-        "conductor": "Al",
-        "voltage_u0": "18/30 (36) kV",
-        "layout": "Trefoil",
-        "armour": False,
-        "core_type": "Single Core",
-        "veins": 1,
-        "length": 10061.0,
-        "parallel_circuits": 4, # n circuits in group
-        "spacing": 200.0,
-        "depth": 0.8
-    })
+    st.session_state.circuits[circuit_index]["sections"].append(dict(DEFAULT_SECTION))
 
 def remove_section(circuit_index, section_index):
     st.session_state.circuits[circuit_index]["sections"].pop(section_index)
 
-col_add, _ = st.columns([1, 4])
-if col_add.button("➕ Añadir Nuevo Circuito"):
+col_add, col_mode, col_table = st.columns([1, 2, 2])
+
+# Large projects: one page of circuits at a time, each circuit an isolated
+# fragment, and a summary table instead of per-tramo reports. The default
+# follows the project size only until the user flips the toggle; from then
+# on their choice is kept whatever the tramo count
+total_tramos = sum(len(c["sections"]) for c in st.session_state.circuits)
+if not st.session_state.get("large_mode_chosen"):
+    st.session_state.large_mode = total_tramos > LARGE_PROJECT_TRAMOS
+large_mode = col_mode.toggle("🗂️ Modo proyecto grande", key="large_mode",
+                             on_change=lambda: st.session_state.update(large_mode_chosen=True),
+                             help=f"Activado por defecto a partir de {LARGE_PROJECT_TRAMOS} tramos")
+
+# Table mode: all tramos in one columnar table (tramo_table), edited in bulk
+# and evaluated column-wise; the circuits list is rebuilt when leaving it
+table_mode = col_table.toggle("✏️ Editor en tabla", value=False,
+                              help="Edición masiva de tramos: pegar desde Excel y editar columnas completas")
+if table_mode and "tramos_table" not in st.session_state:
+    import pandas as pd
+    from tramo_table import CIRCUIT_COLUMN, TABLE_COLUMNS, circuits_to_columns
+    dtypes = {CIRCUIT_COLUMN: "int64", **{name: type(default) for name, default in DEFAULT_SECTION.items()}}
+    st.session_state.tramos_table = pd.DataFrame(circuits_to_columns(st.session_state.circuits), columns=TABLE_COLUMNS).astype(dtypes)
+elif not table_mode and "tramos_table" in st.session_state:
+    from tramo_table import columns_to_circuits, validate_columns
+    edited = st.session_state.pop("tramos_current", st.session_state.tramos_table)
+    columns = {name: edited[name].to_numpy() for name in edited.columns}
+    if validate_columns(columns):
+        st.warning("⚠️ La tabla de tramos tenía errores; se conservan los circuitos anteriores.")
+    else:
+        st.session_state.circuits = columns_to_circuits(columns)
+    del st.session_state.tramos_table
+    st.session_state.pop("tramos_editor", None)
+
+if not table_mode and col_add.button("➕ Añadir Nuevo Circuito"):
     add_circuit()
 
-# Display Circuits
-for i in range(len(st.session_state.circuits)):
-    if i >= len(st.session_state.circuits): break
+def rerun_circuit(in_fragment):
+    # Tramo edits only need to rebuild their own circuit fragment; a fragment
+    # rerun is only allowed while the fragment itself is rerunning
+    if in_fragment:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            pass
+    st.rerun()
+
+def render_circuit(i, in_fragment=False):
+    if i >= len(st.session_state.circuits): return
     
     circuit = st.session_state.circuits[i]
     
@@ -89,7 +145,7 @@ for i in range(len(st.session_state.circuits)):
     # Add Section to Circuit
     if st.button(f"➕ Añadir Tramo al Circuito {i+1}", key=f"btn_add_sec_{i}"):
         add_section(i)
-        st.rerun()
+        rerun_circuit(in_fragment)
 
     # Sections Inputs
     cumulative_power = 0
@@ -101,13 +157,13 @@ for i in range(len(st.session_state.circuits)):
         
         st.markdown(f"**🛣️ Tramo {j+1}**")
         
-        with st.expander(f"⚙️ Configuración Tramo {j+1}", expanded=True):
+        with st.expander(f"⚙️ Configuración Tramo {j+1}", expanded=not large_mode):
             # Header with delete button
             h_col1, h_col2 = st.columns([6, 1])
             with h_col2:
                 if st.button(f"🗑️", key=f"del_sec_{i}_{j}", help="Eliminar este tramo"):
                     remove_section(i, j)
-                    st.rerun()
+                    rerun_circuit(in_fragment)
                     
             col1, col2, col3 = st.columns(3)
             
@@ -136,131 +192,361 @@ for i in range(len(st.session_state.circuits)):
             
             section["armour"] = st.checkbox("¿Tiene Armadura? 🛡️", value=section["armour"], key=f"arm_{i}_{j}")
 
+@st.fragment
+def render_circuit_fragment(i):
+    render_circuit(i, in_fragment=True)
+
+# Display Circuits
+n_circuits = len(st.session_state.circuits)
+table_errors = []
+if table_mode:
+    import pandas as pd
+    from tramo_table import ALLOWED_VALUES, CIRCUIT_COLUMN, INTEGER_COLUMNS, NUMERIC_MINIMUMS, validate_columns
+    st.caption("Un tramo por fila; la columna Circuito agrupa los tramos y la potencia se acumula en el orden de las filas. "
+               "Se pueden pegar filas copiadas de Excel (Ctrl+V) y añadir o borrar filas al final de la tabla.")
+    labels = {
+        CIRCUIT_COLUMN: "Circuito", "pb_power": "Potencia PB (kVA)", "install_type": "Tipo Instalación",
+        "insulation": "Aislamiento", "section_mm2": "Sección (mm²)", "conductor": "Conductor",
+        "voltage_u0": "Tensión Um", "layout": "Disposición", "armour": "Armadura", "core_type": "Tipo Cable",
+        "veins": "Venas", "length": "Longitud (m)", "parallel_circuits": "Circuitos en Paralelo",
+        "spacing": "Separación (mm)", "depth": "Profundidad (m)",
+    }
+    column_config = {CIRCUIT_COLUMN: st.column_config.NumberColumn(labels[CIRCUIT_COLUMN], min_value=NUMERIC_MINIMUMS[CIRCUIT_COLUMN], step=1, default=max(n_circuits, 1), required=True)}
+    for name, default in DEFAULT_SECTION.items():
+        if name in ALLOWED_VALUES:
+            column_config[name] = st.column_config.SelectboxColumn(labels[name], options=ALLOWED_VALUES[name], default=default, required=True)
+        elif name == "armour":
+            column_config[name] = st.column_config.CheckboxColumn(labels[name], default=default)
+        else:
+            column_config[name] = st.column_config.NumberColumn(labels[name], min_value=NUMERIC_MINIMUMS[name], step=1 if name in INTEGER_COLUMNS else None,
+                                                                default=default, required=True)
+    edited = st.data_editor(st.session_state.tramos_table, key="tramos_editor", num_rows="dynamic",
+                            column_config=column_config, hide_index=True, width="stretch")
+    st.session_state.tramos_current = edited
+    table_columns = {name: edited[name].to_numpy() for name in edited.columns}
+    table_errors = validate_columns(table_columns)
+    for message in table_errors:
+        st.error(message)
+
+    with st.expander("🧮 Editar columna completa"):
+        e_col1, e_col2, e_col3 = st.columns(3)
+        bulk_name = e_col1.selectbox("Columna", list(DEFAULT_SECTION), format_func=labels.get, key="bulk_column")
+        if bulk_name in ALLOWED_VALUES:
+            bulk_value = e_col2.selectbox("Valor", ALLOWED_VALUES[bulk_name], key=f"bulk_value_{bulk_name}")
+        elif bulk_name == "armour":
+            bulk_value = e_col2.checkbox("Valor", key="bulk_value_armour")
+        else:
+            bulk_value = e_col2.number_input("Valor", value=DEFAULT_SECTION[bulk_name], min_value=type(DEFAULT_SECTION[bulk_name])(NUMERIC_MINIMUMS[bulk_name]), key=f"bulk_value_{bulk_name}")
+        bulk_circuits = e_col3.text_input("Circuitos (vacío = todos)", key="bulk_circuits", help="Números separados por comas")
+        if st.button("Aplicar a la columna"):
+            table = edited.copy()
+            try:
+                selected = [int(c) for c in bulk_circuits.split(",") if c.strip()]
+            except ValueError:
+                selected = None
+                st.error("Circuitos no válidos; use números separados por comas.")
+            if selected is not None:
+                rows = table[CIRCUIT_COLUMN].isin(selected) if selected else slice(None)
+                table.loc[rows, bulk_name] = bulk_value
+                # New base table: the editor's pending edits are already in it
+                st.session_state.tramos_table = table
+                st.session_state.pop("tramos_editor", None)
+                st.rerun()
+elif large_mode and n_circuits:
+    n_pages = (n_circuits + CIRCUITS_PER_PAGE - 1) // CIRCUITS_PER_PAGE
+    page = st.number_input(f"Página de circuitos (de {n_pages})", min_value=1, max_value=n_pages, value=1, step=1) if n_pages > 1 else 1
+    first = (page - 1) * CIRCUITS_PER_PAGE
+    st.caption(f"Circuitos {first+1}–{min(first + CIRCUITS_PER_PAGE, n_circuits)} de {n_circuits} ({total_tramos} tramos)")
+    for i in range(first, min(first + CIRCUITS_PER_PAGE, n_circuits)):
+        render_circuit_fragment(i)
+else:
+    for i in range(n_circuits):
+        render_circuit(i)
+
 # --- Calculation & Reporting ---
 st.markdown("---")
 
+def project_tramos():
+    # Project-level analyses run on tramo arrays grouped by circuit:
+    # (arrays, design_power, tramos per circuit, circuit numbers), or None
+    # without tramos. Table mode builds them straight from the table columns
+    if table_mode:
+        from tramo_table import grouped_arrays
+        if table_errors:
+            st.error("❌ Corrija los errores de la tabla de tramos.")
+            return None
+        return grouped_arrays(table_columns) if len(edited) else None
+    import batch
+    arrays, design_power, counts = batch.project_arrays(st.session_state.circuits)
+    return None if arrays is None else (arrays, design_power, counts, list(range(1, len(counts) + 1)))
+
 if st.button("🚀 Calcular Ampacidad", type="primary"):
+    import pandas as pd
     st.markdown("## 📊 Resultados del Cálculo")
     
-    if not st.session_state.circuits:
+    if not (len(edited) if table_mode else st.session_state.circuits):
         st.warning("⚠️ No hay circuitos definidos.")
     
-    for i, circuit in enumerate(st.session_state.circuits):
-        st.markdown(f"### 🔌 Circuito {i+1}")
-        
-        cumulative_p = 0
-        if not circuit["sections"]:
-            st.info("ℹ️ Circuito sin tramos.")
-            continue
-
-        for j, section in enumerate(circuit["sections"]):
-            # Calc Power
-            cumulative_p += section["pb_power"]
-            design_power = cumulative_p
-            
-            # 1. Calc Ib
-            ib = calculate_ib(design_power, voltage_sys, pf, oversizing)
-            
-            # 2. Get Factors
-            k1, src_k1 = get_k1(temp_ground, section["insulation"])
-            k2, src_k2 = get_k2(section["depth"], section["section_mm2"], section["install_type"])
-            k3, src_k3 = get_k3(resistivity_ground, section["install_type"], section["core_type"], section["section_mm2"])
-            k4, src_k4 = get_k4(section["parallel_circuits"], section["spacing"], section["install_type"], section["core_type"])
-            
-            # 3. Base Ampacity (Iz)
-            # Map insulation types - HEPR uses EPR values
-            if section["insulation"] == "HEPR":
-                db_ins = "EPR"
+    site = {"temp_ground": temp_ground, "resistivity_ground": resistivity_ground}
+    system = {"voltage": voltage_sys, "frequency": frequency, "pf": pf, "oversizing": oversizing}
+    st.session_state.recorder.reset()
+    summary = None
+    if table_mode:
+        # Columnar path: the edited table goes straight to the batch engine
+        import numpy as np
+        import batch
+        from tramo_table import table_arrays
+        if table_errors:
+            st.error("❌ Corrija los errores de la tabla de tramos antes de calcular.")
+        elif len(edited):
+            with instrumentation.stage("evaluate_table"):
+                arrays, power = table_arrays(table_columns)
+                res = batch.evaluate_tramos(arrays, power, site, system)
+            n = len(edited)
+            summary = pd.DataFrame({
+                "Circuito": edited[CIRCUIT_COLUMN].to_numpy(),
+                "Tramo": edited.groupby(CIRCUIT_COLUMN).cumcount().to_numpy() + 1,
+                "Potencia (kVA)": res["design_power"],
+                "Ib (A)": np.round(res["ib"], 2),
+                "Iz' (A)": np.round(np.broadcast_to(res["iz_prime"], (n,)), 2),
+                "Iz base (A)": res["base_iz"],
+                **{f"K{k}": np.round(np.broadcast_to(res[f"k{k}"], (n,)), 3) for k in range(1, 5)},
+                "Cumple": np.where(res["base_iz"] == 0, "⚠️ Sin ampacidad base", np.where(res["passed"], "✅", "❌")),
+            })
+            if fault_durations:
+                from shortcircuit import check_short_circuit
+                with instrumentation.stage("short_circuit"):
+                    sc = check_short_circuit(arrays, fault_ka, fault_durations)
+                summary["Cortocircuito"] = np.where(sc["sc_passed"], "✅", "❌")
+            st.caption(f"🧮 {n} tramos evaluados por columnas | Tablas: {compiled_tables.TABLES.name} ({compiled_tables.TABLES.fingerprint[:12]})")
+    else:
+        with instrumentation.stage("evaluate_project"):
+            if debug_profile:
+                project_results, st.session_state.profile_report = instrumentation.profile_call(
+                    st.session_state.evaluator.evaluate, st.session_state.circuits, site, system
+                )
             else:
-                db_ins = section["insulation"]  # EPR or XLPE
-            
-            db_cond = section["conductor"]
-            db_core = section["core_type"]
-            
-            # Map installation type to database keys
-            # "Directamente enterrado" -> "Direct"
-            # "Enterrado bajo tubo" -> "Ducts"
-            if section["install_type"] == "Directamente enterrado":
-                db_inst = "Direct"
-            elif section["install_type"] == "Enterrado bajo tubo":
-                db_inst = "Ducts"
-            # Armor parameter logic based on cable type per IEC 60502-2:
-            # - Single Core (Tables B.2-B.5): ampacity does NOT distinguish by armor
-            # - Three Core (Tables B.6-B.9): ampacity DOES distinguish by armor
-            if section["core_type"] == "Single Core":
-                # Single Core cables: always use "Unarmoured" for ampacity lookup
-                db_armor = "Unarmoured"
-            else:
-                # Three Core cables: use actual armor selection
-                db_armor = "Armoured" if section["armour"] else "Unarmoured"
-            
-            # Map layout - Single Core cables have different ampacities by layout
-            # Three Core cables use "N/A" as they don't have layout distinctions
-            if section["core_type"] == "Single Core":
-                layout_selection = section.get("layout", "Trefoil")
-                if layout_selection == "Trefoil":
-                    db_layout = "Trefoil"
-                elif layout_selection == "Flat spaced":
-                    db_layout = "Flat Spaced"
-                elif layout_selection == "Flat touching ducts":
-                    db_layout = "Flat Touching"
-                else:
-                    db_layout = "Trefoil"  # Default conservative
-            else:
-                # Three Core cables don't have layout distinction in IEC tables
-                db_layout = "N/A"
-            
-            try:
-                # Use robust lookup with 6-tuple key
-                # key is (Ins, Cond, Core, Install, Armoring, Layout)
-                record = AMPACITY_DB.get((db_ins, db_cond, db_core, db_inst, db_armor, db_layout))
-                if record:
-                    base_iz = record["data"].get(section["section_mm2"], 0)
-                    source_table = record["source"]
-                else:
-                    base_iz = 0
-                    source_table = "Desconocida"
-                
-                if base_iz == 0:
-                    st.error(f"❌ No se encontró ampacidad base en DB para los parámetros seleccionados en el tramo {j+1}.")
+                project_results = st.session_state.evaluator.evaluate(st.session_state.circuits, site, system)
+        if fault_durations:
+            from shortcircuit import merge_short_circuit
+            with instrumentation.stage("short_circuit"):
+                project_results = merge_short_circuit(st.session_state.circuits, project_results, fault_ka, fault_durations)
+        eval_stats = st.session_state.evaluator.stats
+        st.caption(f"♻️ Tramos recalculados: {eval_stats['recomputed']} | Ib actualizada: {eval_stats['ib_refreshed']} | Reutilizados: {eval_stats['reused']} | Desde caché: {eval_stats['from_store']} | Tablas: {compiled_tables.TABLES.name} ({compiled_tables.TABLES.fingerprint[:12]})")
+    
+    if large_mode and not table_mode:
+        rows = []
+        for i, results in enumerate(project_results):
+            for j, res in enumerate(results):
+                row = {
+                    "Circuito": i+1, "Tramo": j+1,
+                    "Potencia (kVA)": res["design_power"],
+                    "Ib (A)": round(res["ib"], 2),
+                    "Iz' (A)": round(res["iz_prime"], 2),
+                    "Iz base (A)": res["base_iz"],
+                    "K1": round(res["k1"], 3), "K2": round(res["k2"], 3),
+                    "K3": round(res["k3"], 3), "K4": round(res["k4"], 3),
+                    "Cumple": "✅" if res["passed"] else "❌",
+                }
+                if "sc_passed" in res:
+                    row["Cortocircuito"] = "✅" if res["sc_passed"] else "❌"
+                if res["error"]:
+                    row["Cumple"] = "⚠️ Sin ampacidad base" if res["error"] == "not_found" else f"⚠️ {res['error']}"
+                rows.append(row)
+        if rows:
+            summary = pd.DataFrame(rows)
+    elif not table_mode:
+        for i, (circuit, results) in enumerate(zip(st.session_state.circuits, project_results)):
+            st.markdown(f"### 🔌 Circuito {i+1}")
+        
+            if not circuit["sections"]:
+                st.info("ℹ️ Circuito sin tramos.")
+                continue
 
-            except Exception as e:
-                base_iz = 0
-                source_table = "Error"
-                st.error(f"Error lookup: {e}")
+            for j, (section, res) in enumerate(zip(circuit["sections"], results)):
+                design_power = res["design_power"]
+                ib, iz_prime, base_iz = res["ib"], res["iz_prime"], res["base_iz"]
+                k1, k2, k3, k4 = res["k1"], res["k2"], res["k3"], res["k4"]
+                src_k1, src_k2, src_k3, src_k4 = res["src_k1"], res["src_k2"], res["src_k3"], res["src_k4"]
+                source_table = res["source_table"]
+                passed = res["passed"]
+                status_icon = "✅" if passed else "❌"
             
-            # 4. Corrected Iz'
-            iz_prime = base_iz * k1 * k2 * k3 * k4
-            
-            # 5. Verification
-            passed = ib <= iz_prime
-            status_color = "green" if passed else "red"
-            status_icon = "✅" if passed else "❌"
+                if res["error"] == "not_found":
+                    st.error(f"❌ No se encontró ampacidad base en DB para los parámetros seleccionados en el tramo {j+1}.")
+                elif res["error"]:
+                    st.error(res["error"])
             
-            # Display Report
-            with st.container():
-                st.markdown(f"#### 🛣️ Tramo {j+1} | {design_power} kVA | Resultado: {status_icon}")
+                # Display Report
+                with instrumentation.stage("render_tramo"), st.container():
+                    st.markdown(f"#### 🛣️ Tramo {j+1} | {design_power} kVA | Resultado: {status_icon}")
                 
-                r_col1, r_col2, r_col3 = st.columns(3)
-                r_col1.metric("Corriente Diseño (Ib)", f"{ib:.2f} A")
-                r_col2.metric("Ampacidad Corregida (Iz')", f"{iz_prime:.2f} A", delta=f"{iz_prime-ib:.2f} A", delta_color="normal" if passed else "inverse")
-                r_col3.metric("Ampacidad Base (Iz)", f"{base_iz} A", help=f"Fuente: {source_table}")
+                    r_col1, r_col2, r_col3 = st.columns(3)
+                    r_col1.metric("Corriente Diseño (Ib)", f"{ib:.2f} A")
+                    r_col2.metric("Ampacidad Corregida (Iz')", f"{iz_prime:.2f} A", delta=f"{iz_prime-ib:.2f} A", delta_color="normal" if passed else "inverse")
+                    r_col3.metric("Ampacidad Base (Iz)", f"{base_iz} A", help=f"Fuente: {source_table}")
                 
-                with st.expander("📝 Detalles de Factores de Corrección"):
-                    f_df = pd.DataFrame({
-                        "Factor": ["K1 (Temp)", "K2 (Profundidad)", "K3 (Resistividad)", "K4 (Agrupamiento)"],
-                        "Valor": [f"{k1:.3f}", f"{k2:.3f}", f"{k3:.3f}", f"{k4:.3f}"],
-                        "Fuente": [src_k1, src_k2, src_k3, src_k4],
-                        "Input Usuario": [f"{temp_ground} ºC", f"{section['depth']} m", f"{resistivity_ground} K·m/W", f"{section['parallel_circuits']} circs @ {section['spacing']} mm"]
-                    })
-                    st.table(f_df)
+                    with st.expander("📝 Detalles de Factores de Corrección"):
+                        f_df = pd.DataFrame({
+                            "Factor": ["K1 (Temp)", "K2 (Profundidad)", "K3 (Resistividad)", "K4 (Agrupamiento)"],
+                            "Valor": [f"{k1:.3f}", f"{k2:.3f}", f"{k3:.3f}", f"{k4:.3f}"],
+                            "Fuente": [src_k1, src_k2, src_k3, src_k4],
+                            "Input Usuario": [f"{temp_ground} ºC", f"{section['depth']} m", f"{resistivity_ground} K·m/W", f"{section['parallel_circuits']} circs @ {section['spacing']} mm"]
+                        })
+                        st.table(f_df)
                 
-                if not passed:
-                    st.error(f"⚠️ **VALIDACIÓN FALLIDA**: El cable NO CUMPLE. La corriente de diseño ({ib:.2f} A) es MAYOR que la ampacidad corregida ({iz_prime:.2f} A).")
-                else:
-                    st.success("✅ **VALIDACIÓN EXITOSA**: El cable CUMPLE con los requisitos de ampacidad calculada.")
+                    if "sc_passed" in res:
+                        sc_text = ", ".join(
+                            f"{t} s: {w:.1f} kA {'✅' if ok else '❌'}"
+                            for t, w, ok in zip(res["sc_durations"], res["sc_withstand_ka"], res["sc_passed_by_duration"])
+                        )
+                        sc_msg = f"💥 Cortocircuito ({res['fault_ka']} kA) — corriente admisible: {sc_text} | tiempo máx.: {res['sc_max_duration']:.2f} s"
+                        (st.info if res["sc_passed"] else st.warning)(sc_msg)
+
+                    if not passed:
+                        st.error(f"⚠️ **VALIDACIÓN FALLIDA**: El cable NO CUMPLE. La corriente de diseño ({ib:.2f} A) es MAYOR que la ampacidad corregida ({iz_prime:.2f} A).")
+                    else:
+                        st.success("✅ **VALIDACIÓN EXITOSA**: El cable CUMPLE con los requisitos de ampacidad calculada.")
             
-            st.divider()
+                st.divider()
+
+    if summary is not None:
+        failed = int((summary["Cumple"] != "✅").sum())
+        (st.error if failed else st.success)(f"{len(summary) - failed} de {len(summary)} tramos cumplen.")
+        with instrumentation.stage("render_summary"):
+            st.dataframe(summary, hide_index=True)
+
+if st.button("📐 Dimensionar Sección Mínima"):
+    import pandas as pd
+    from sizing import size_project_arrays
+    st.markdown("## 📐 Sección Mínima por Tramo")
+    
+    site = {"temp_ground": temp_ground, "resistivity_ground": resistivity_ground}
+    system = {"voltage": voltage_sys, "frequency": frequency, "pf": pf, "oversizing": oversizing}
+    project = project_tramos()
+    sizing_results = size_project_arrays(*project[:3], site, system, conductors=["Al", "Cu"]) if project else []
+    
+    rows = []
+    for number, results in zip(project[3] if project else [], sizing_results):
+        for j, res in enumerate(results):
+            row = {"Circuito": number, "Tramo": j+1, "Potencia (kVA)": res["design_power"], "Ib (A)": round(res["ib"], 2)}
+            for cond, sized in res["sizing"].items():
+                # Numeric column (None when no section suffices) plus a text status column
+                row[f"Sección {cond} (mm²)"] = sized["section_mm2"]
+                row[f"Estado {cond}"] = "✅" if sized["section_mm2"] is not None else "❌ Ninguna"
+                row[f"Iz' {cond} (A)"] = round(sized["iz_prime"], 2) if sized["iz_prime"] is not None else None
+            rows.append(row)
+    
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+    else:
+        st.warning("⚠️ No hay tramos definidos.")
+
+if st.button("🔋 Capacidad Disponible"):
+    import pandas as pd
+    from capacity import capacity_project_arrays
+    st.markdown("## 🔋 Potencia Máxima Admisible y Reserva")
+
+    site = {"temp_ground": temp_ground, "resistivity_ground": resistivity_ground}
+    system = {"voltage": voltage_sys, "frequency": frequency, "pf": pf, "oversizing": oversizing}
+    project = project_tramos()
+    capacity_results = capacity_project_arrays(*project[:3], site, system) if project else []
+
+    rows = []
+    for number, circuit in zip(project[3] if project else [], capacity_results):
+        if circuit["spare"] is not None:
+            st.markdown(f"**Circuito {number}:** reserva {circuit['spare']:.1f} kVA (tramo limitante {circuit['limiting_tramo']+1})")
+        for j, res in enumerate(circuit["tramos"]):
+            rows.append({
+                "Circuito": number, "Tramo": j+1,
+                "Potencia (kVA)": round(res["design_power"], 1),
+                "Iz' (A)": round(res["iz_prime"], 2),
+                "Potencia máx. (kVA)": round(res["max_power"], 1),
+                "Reserva tramo (kVA)": round(res["spare"], 1),
+                "Conectable aquí (kVA)": round(res["headroom"], 1),
+            })
+
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+    else:
+        st.warning("⚠️ No hay tramos definidos.")
+
+if st.button("📉 Caída de Tensión y Pérdidas"):
+    import pandas as pd
+    from losses import losses_project_arrays
+    st.markdown("## 📉 Caída de Tensión y Pérdidas por Efecto Joule")
+    st.caption("Resistencia a la temperatura máxima del conductor; reactancia típica según disposición.")
+
+    system = {"voltage": voltage_sys, "frequency": frequency, "pf": pf, "oversizing": oversizing}
+    project = project_tramos()
+    losses_results = losses_project_arrays(*project[:3], system) if project else []
+
+    rows = []
+    for number, circuit in zip(project[3] if project else [], losses_results):
+        if circuit["tramos"]:
+            st.markdown(f"**Circuito {number}:** ΔU total {circuit['drop_pct']:.2f} %, pérdidas {circuit['losses_kw']:.1f} kW")
+        for j, res in enumerate(circuit["tramos"]):
+            rows.append({
+                "Circuito": number, "Tramo": j+1,
+                "Potencia (kVA)": round(res["design_power"], 1),
+                "Ib (A)": round(res["ib"], 2),
+                "ΔU (V)": round(res["voltage_drop"], 1),
+                "ΔU (%)": round(res["voltage_drop_pct"], 3),
+                "ΔU acumulada (%)": round(res["cumulative_drop_pct"], 3),
+                "Pérdidas (kW)": round(res["losses_kw"], 2),
+            })
+
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+    else:
+        st.warning("⚠️ No hay tramos definidos.")
+
+with st.expander("🎲 Análisis Probabilístico (Monte Carlo)"):
+    st.caption("Temperatura y resistividad del terreno como variables inciertas; las medias son los valores de la barra lateral.")
+    mc_col1, mc_col2, mc_col3, mc_col4 = st.columns(4)
+    temp_std = mc_col1.number_input("Desv. típica temperatura (ºC)", value=3.0, min_value=0.0, step=0.5)
+    resistivity_std = mc_col2.number_input("Desv. típica resistividad (K·m/W)", value=0.3, min_value=0.0, step=0.05)
+    n_samples = mc_col3.number_input("Muestras", value=100_000, min_value=1_000, step=10_000)
+    mc_seed = mc_col4.number_input("Semilla", value=0, min_value=0, step=1)
+    run_mc = st.button("🎲 Ejecutar Monte Carlo")
+
+if run_mc:
+    import pandas as pd
+    from montecarlo import monte_carlo_project_arrays
+    st.markdown("## 🎲 Probabilidad de Fallo por Tramo")
+
+    system = {"voltage": voltage_sys, "frequency": frequency, "pf": pf, "oversizing": oversizing}
+    # Resistivity is positive: lognormal with the given mean and deviation
+    temp_dist = {"dist": "normal", "mean": temp_ground, "std": temp_std}
+    resistivity_dist = {"dist": "lognormal", "mean": resistivity_ground, "std": resistivity_std} if resistivity_std > 0 else resistivity_ground
+    project = project_tramos()
+    mc_results = monte_carlo_project_arrays(*project[:3], temp_dist, resistivity_dist, system,
+                                            n_samples=int(n_samples), seed=int(mc_seed)) if project else []
+
+    rows = []
+    for number, results in zip(project[3] if project else [], mc_results):
+        for j, res in enumerate(results):
+            row = {"Circuito": number, "Tramo": j+1, "Ib (A)": round(res["ib"], 2),
+                   "P(fallo) (%)": round(100 * res["failure_probability"], 3)}
+            for p, margin in res["margin_percentiles"].items():
+                row[f"Margen P{p} (A)"] = round(margin, 2)
+            rows.append(row)
+
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+    else:
+        st.warning("⚠️ No hay tramos definidos.")
+
+# Debug panel
+if debug_timing:
+    stage_stats = st.session_state.recorder.snapshot()
+    if stage_stats:
+        import pandas as pd
+        st.sidebar.dataframe(pd.DataFrame.from_dict(stage_stats, orient="index").round(2))
+        st.sidebar.download_button("💾 Descargar tiempos (JSON)", st.session_state.recorder.dump_json(), file_name="instrumentacion.json", mime="application/json")
+if debug_profile and st.session_state.get("profile_report"):
+    with st.sidebar.expander("🔬 Informe cProfile"):
+        st.code(st.session_state.profile_report)
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,370 @@
+# batch.py
+# Vectorized (NumPy) evaluation of IEC 60502-2 correction factors for many tramos at once.
+# Gives the same numbers as the scalar functions in calculations.py.
+
+import math
+from itertools import accumulate
+import numpy as np
+import ampacity_array
+from engine import DEFAULT_SECTION
+import compiled_tables
+from instrumentation import timed
+
+# --- Category codes ---
+# Integer codes used by the batch API instead of the UI strings.
+INSTALL_TYPES = ["Directamente enterrado", "Enterrado bajo tubo"]
+CORE_TYPES = ["Single Core", "Three Core"]
+INSULATIONS = ["EPR", "HEPR", "XLPE"]
+CONDUCTORS = ["Al", "Cu"]
+LAYOUTS = ["Trefoil", "Flat spaced", "Flat touching ducts"]
+
+INSTALL_DIRECT, INSTALL_DUCTS = 0, 1
+CORE_SINGLE, CORE_THREE = 0, 1
+
+def encode(values, categories):
+    """Map a sequence of category strings to an int array of codes."""
+    lookup = {name: code for code, name in enumerate(categories)}
+    return np.fromiter((lookup[v] for v in values), dtype=np.int64, count=len(values))
+
+# --- Table arrays ---
+# Table index for K3/K4 is 2 * core + install:
+#   0: Single Core direct, 1: Single Core ducts, 2: Three Core direct, 3: Three Core ducts
+K3_ORDER = ["B14", "B15", "B16", "B17"]
+K4_ORDER = ["B19", "B21", "B18", "B20"]
+
+def _axis(tables):
+    """Sorted key axis shared by several tables (ValueError if they differ)."""
+    keys = sorted(tables[0])
+    for table in tables[1:]:
+        if sorted(table) != keys:
+            raise ValueError("Las tablas no comparten los mismos valores de entrada.")
+    return np.array(keys, dtype=float)
+
+def table_arrays(raw):
+    """
+    Correction-factor tables of a raw table set (compiled_tables.builtin_tables)
+    as NumPy arrays, in the layout used by the batch functions.
+    """
+    b11 = raw["B11"]
+    k2 = [raw["B12"], raw["B13"]]
+    k3 = [raw[name] for name in K3_ORDER]
+    k4 = [raw[name] for name in K4_ORDER]
+
+    k4_values = np.array([
+        [[np.nan if t[c][s] is None else t[c][s] for s in sorted(t[c])] for c in sorted(t)]
+        for t in k4
+    ], dtype=float)  # (table, circuits, spacing), NaN where the standard gives no value
+    defined = ~np.isnan(k4_values)
+    if (defined[..., 1:] & ~defined[..., :-1]).any():
+        raise ValueError("En las tablas K4 solo pueden faltar las últimas separaciones.")
+    if not defined[..., 0].all():
+        raise ValueError("Cada fila de las tablas K4 necesita al menos una separación definida.")
+
+    return {
+        "b11_temps": _axis([b11]),
+        "b11_values": np.array([b11[t] for t in sorted(b11)], dtype=float),  # (temperature, column)
+        "k2_depths": _axis(k2),
+        "k2_values": np.array([[t[d] for d in sorted(t)] for t in k2], dtype=float),  # (install, depth, column)
+        "k3_sections": _axis(k3),
+        "k3_resistivities": _axis([t[s] for t in k3 for s in t]),
+        "k3_values": np.array([
+            [[t[s][r] for r in sorted(t[s])] for s in sorted(t)] for t in k3
+        ], dtype=float),  # (table, section, resistivity)
+        "k4_circuits": _axis(k4),
+        "k4_spacings": _axis([t[c] for t in k4 for c in t]),
+        "k4_values": k4_values,
+    }
+
+def _set_arrays(arrays):
+    global _B11_KEYS, _B11_VALUES, _K2_KEYS, _K2_VALUES
+    global _K3_SECTIONS, _K3_RESISTIVITIES, _K3_VALUES
+    global _K4_CIRCUITS, _K4_SPACINGS, _K4_VALUES, _K4_VALID
+    _B11_KEYS = arrays["b11_temps"]
+    _B11_VALUES = arrays["b11_values"][:, 1]  # EPR/HEPR/XLPE column
+    _K2_KEYS = arrays["k2_depths"]
+    _K2_VALUES = arrays["k2_values"]
+    _K3_SECTIONS = arrays["k3_sections"]
+    _K3_RESISTIVITIES = arrays["k3_resistivities"]
+    _K3_VALUES = arrays["k3_values"]
+    _K4_CIRCUITS = arrays["k4_circuits"]
+    _K4_SPACINGS = arrays["k4_spacings"]
+    _K4_VALUES = arrays["k4_values"]
+    # Defined spacings are always a prefix of the spacing axis
+    _K4_VALID = (~np.isnan(_K4_VALUES)).sum(axis=2)
+
+def _load_tables(tables):
+    _set_arrays(tables.arrays if tables.arrays is not None else table_arrays(tables.raw))
+
+_load_tables(compiled_tables.TABLES)
+compiled_tables.on_tables_changed(_load_tables)
+
+# --- Helpers ---
+
+def _bracket(keys, x, upper=None):
+    """
+    Index of the lower key of the interval used for x, matching the scalar
+    functions: first interval containing x, or the end intervals when
+    extrapolating. `upper` optionally limits the last usable key per element.
+    """
+    idx = np.searchsorted(keys, x, side="left") - 1
+    last = len(keys) - 2 if upper is None else upper - 2
+    return np.clip(idx, 0, last)
+
+def _interp(x, x1, y1, x2, y2):
+    """Vectorized interpolate_linear (same operation order)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(x2 == x1, y1, y1 + (x - x1) * (y2 - y1) / (x2 - x1))
+
+def _table_index(install, core):
+    return 2 * np.asarray(core) + np.asarray(install)
+
+# --- Factors ---
+
+def batch_k1(temp_ground):
+    """K1 - Soil Temperature Factor (Table B.11), EPR/HEPR/XLPE column."""
+    t = np.asarray(temp_ground, dtype=float)
+    i = _bracket(_B11_KEYS, t)
+    return _interp(t, _B11_KEYS[i], _B11_VALUES[i], _B11_KEYS[i + 1], _B11_VALUES[i + 1])
+
+def batch_k2(depth, section, install):
+    """K2 - Burial Depth Factor (Table B.12/B.13)."""
+    d = np.asarray(depth, dtype=float)
+    inst = np.asarray(install)
+    col = np.where(np.asarray(section) <= 185, 0, 1)
+    i = _bracket(_K2_KEYS, d)
+    y1 = _K2_VALUES[inst, i, col]
+    y2 = _K2_VALUES[inst, i + 1, col]
+    return _interp(d, _K2_KEYS[i], y1, _K2_KEYS[i + 1], y2)
+
+def batch_k3(resistivity, install, core, section):
+    """K3 - Soil Thermal Resistivity Factor (Tables B.14 - B.17)."""
+    r = np.asarray(resistivity, dtype=float)
+    s = np.asarray(section, dtype=float)
+    t = _table_index(install, core)
+
+    # Step 1: section bracket. Exact and out-of-range sections use a table row directly.
+    s_clamped = np.clip(s, _K3_SECTIONS[0], _K3_SECTIONS[-1])
+    si = _bracket(_K3_SECTIONS, s_clamped)
+    direct = np.isin(s_clamped, _K3_SECTIONS)
+    direct_row = np.searchsorted(_K3_SECTIONS, s_clamped)
+    direct_row = np.minimum(direct_row, len(_K3_SECTIONS) - 1)
+
+    # Step 2: resistivity bracket
+    ri = _bracket(_K3_RESISTIVITIES, r)
+    r1 = _K3_RESISTIVITIES[ri]
+    r2 = _K3_RESISTIVITIES[ri + 1]
+
+    s1 = _K3_SECTIONS[si]
+    s2 = _K3_SECTIONS[si + 1]
+    y1 = np.where(
+        direct, _K3_VALUES[t, direct_row, ri],
+        _interp(s, s1, _K3_VALUES[t, si, ri], s2, _K3_VALUES[t, si + 1, ri])
+    )
+    y2 = np.where(
+        direct, _K3_VALUES[t, direct_row, ri + 1],
+        _interp(s, s1, _K3_VALUES[t, si, ri + 1], s2, _K3_VALUES[t, si + 1, ri + 1])
+    )
+    return _interp(r, r1, y1, r2, y2)
+
+def k3_resistivity_bracket(resistivity):
+    """
+    Resistivity interval of Tables B.14 - B.17 for each sample: (index,
+    offset from the lower key, interval width). Shared by k3_on_bracket()
+    calls when many K3 curves are evaluated at the same resistivities.
+    """
+    r = np.asarray(resistivity, dtype=float)
+    ri = _bracket(_K3_RESISTIVITIES, r)
+    r1 = _K3_RESISTIVITIES[ri]
+    return ri, r - r1, _K3_RESISTIVITIES[ri + 1] - r1
+
+def k3_on_bracket(bracket, install, core, section):
+    """batch_k3() for one table and section (scalars) at a precomputed resistivity bracket."""
+    t = int(_table_index(install, core))
+    s = min(max(float(section), _K3_SECTIONS[0]), _K3_SECTIONS[-1])
+    if s in _K3_SECTIONS:
+        row = _K3_VALUES[t, int(np.searchsorted(_K3_SECTIONS, s))]
+    else:
+        si = int(_bracket(_K3_SECTIONS, s))
+        row = _interp(float(section), _K3_SECTIONS[si], _K3_VALUES[t, si],
+                      _K3_SECTIONS[si + 1], _K3_VALUES[t, si + 1])
+    ri, dx, width = bracket
+    y1, y2 = row[ri], row[ri + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(width == 0, y1, y1 + dx * (y2 - y1) / width)
+
+def batch_k4(num_circuits, spacing, install, core):
+    """K4 - Grouping Factor (Tables B.18 - B.21)."""
+    n = np.asarray(num_circuits, dtype=float)
+    sp = np.asarray(spacing, dtype=float)
+    t = _table_index(install, core)
+
+    def row_factor(row):
+        valid = _K4_VALID[t, row]
+        j = _bracket(_K4_SPACINGS, sp, upper=np.maximum(valid, 2))
+        f = _interp(sp, _K4_SPACINGS[j], _K4_VALUES[t, row, j],
+                    _K4_SPACINGS[j + 1], _K4_VALUES[t, row, j + 1])
+        # A row with a single defined spacing is constant (as the scalar Curve)
+        return np.where(valid == 1, _K4_VALUES[t, row, 0], f)
+
+    ci = _bracket(_K4_CIRCUITS, n)
+    f1 = row_factor(ci)
+    f2 = row_factor(ci + 1)
+    k4 = _interp(n, _K4_CIRCUITS[ci], f1, _K4_CIRCUITS[ci + 1], f2)
+
+    # Interior exact circuit counts use the table row directly
+    exact = np.isin(n, _K4_CIRCUITS) & (n > _K4_CIRCUITS[0]) & (n < _K4_CIRCUITS[-1])
+    exact_row = np.minimum(np.searchsorted(_K4_CIRCUITS, n), len(_K4_CIRCUITS) - 1)
+    k4 = np.where(exact, row_factor(exact_row), k4)
+
+    return np.where(n <= 1, 1.0, k4)
+
+# --- Ampacity ---
+
+def batch_base_iz(insulation, conductor, core, install, armour, layout, section):
+    """
+    Base ampacity Iz for coded tramo parameters (codes as in INSULATIONS,
+    CONDUCTORS, CORE_TYPES, INSTALL_TYPES, LAYOUTS; armour as bool).
+    Gathered from the dense AMPACITY_ARRAY; 0 where not tabulated.
+    """
+    return ampacity_array.lookup(
+        *ampacity_array.db_codes(insulation, conductor, core, install, armour, layout), section
+    )
+
+def batch_ib(power_kva, voltage_kv, pf, oversizing_pct):
+    """Vectorized calculate_ib."""
+    if pf == 0 or voltage_kv == 0:
+        return np.zeros(np.shape(power_kva))
+    base_current = np.asarray(power_kva, dtype=float) / (math.sqrt(3) * voltage_kv * pf)
+    return base_current * (1 + oversizing_pct/100)
+
+@timed("batch.evaluate_batch")
+def evaluate_batch(ib, temp_ground, depth, section, resistivity, num_circuits, spacing,
+                   install, core, insulation, conductor, armour, layout):
+    """
+    Evaluate many tramos in one vectorized pass.
+    All arguments are arrays (or scalars, broadcast) of equal length; category
+    arguments are integer codes. Returns a dict of arrays:
+    k1, k2, k3, k4, base_iz, iz_prime, passed, plus tables_hash (the
+    fingerprint of the active table set).
+    """
+    ib = np.asarray(ib, dtype=float)
+    install = np.asarray(install)
+    core = np.asarray(core)
+    section = np.asarray(section)
+
+    k1 = batch_k1(temp_ground)
+    k2 = batch_k2(depth, section, install)
+    k3 = batch_k3(resistivity, install, core, section)
+    k4 = batch_k4(num_circuits, spacing, install, core)
+    base_iz = batch_base_iz(insulation, conductor, core, install, armour, layout, section)
+
+    iz_prime = base_iz * k1 * k2 * k3 * k4
+    return {
+        "k1": k1, "k2": k2, "k3": k3, "k4": k4,
+        "base_iz": base_iz,
+        "iz_prime": iz_prime,
+        "passed": ib <= iz_prime,
+        "tables_hash": compiled_tables.TABLES.fingerprint,
+    }
+
+# --- Tramo columns ---
+
+NUMERIC_COLUMNS = ["pb_power", "section_mm2", "length", "parallel_circuits", "spacing", "depth"]
+CATEGORY_COLUMNS = {
+    "install_type": INSTALL_TYPES,
+    "core_type": CORE_TYPES,
+    "insulation": INSULATIONS,
+    "conductor": CONDUCTORS,
+    "layout": LAYOUTS,
+}
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "si", "sí")
+    return bool(value)
+
+def _is_number(value):
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+@timed("batch.tramo_arrays")
+def tramo_arrays(columns, first_row=1):
+    """
+    Convert tramo columns (dict name -> sequence, fields as in the app's tramos)
+    to arrays: floats for numeric fields, integer codes for categories and
+    bool for armour. Missing columns take DEFAULT_SECTION values.
+    Raises ValueError on unknown category values or on numeric cells that are
+    empty, null or not finite, naming the row (numbered from first_row).
+    """
+    n = len(next(iter(columns.values())))
+    values = {}
+    for name, default in DEFAULT_SECTION.items():
+        values[name] = columns[name] if name in columns else [default] * n
+
+    arrays = {}
+    for name in NUMERIC_COLUMNS:
+        try:
+            arrays[name] = np.asarray(values[name], dtype=float)
+            valid = bool(np.isfinite(arrays[name]).all())
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            r = next(i for i, v in enumerate(values[name]) if not _is_number(v))
+            raise ValueError(f"Fila {first_row + r}, '{name}': se esperaba un número ({values[name][r]!r})")
+    for name, categories in CATEGORY_COLUMNS.items():
+        try:
+            arrays[name] = encode(values[name], categories)
+        except KeyError:
+            allowed = set(categories)
+            r = next(i for i, v in enumerate(values[name]) if v not in allowed)
+            raise ValueError(f"Fila {first_row + r}, '{name}': valor no permitido {values[name][r]!r}")
+    arrays["armour"] = np.fromiter((_parse_bool(v) for v in values["armour"]), dtype=bool, count=n)
+    return arrays
+
+def sections_to_arrays(sections):
+    """tramo_arrays() for a list of tramo dicts."""
+    return tramo_arrays({name: [s.get(name, default) for s in sections]
+                         for name, default in DEFAULT_SECTION.items()})
+
+@timed("batch.project_arrays")
+def project_arrays(circuits):
+    """
+    Flatten project circuits (as in the app session) into tramo arrays.
+    Returns (arrays, design_power, tramos per circuit); design power
+    accumulates along each circuit.
+    """
+    sections = [s for circuit in circuits for s in circuit["sections"]]
+    design_power = np.array([
+        p for circuit in circuits
+        for p in accumulate(s["pb_power"] for s in circuit["sections"])
+    ], dtype=float)
+    counts = [len(circuit["sections"]) for circuit in circuits]
+    if not sections:
+        return None, design_power, counts
+    return sections_to_arrays(sections), design_power, counts
+
+def split_by_counts(items, counts):
+    """Split per-tramo items into consecutive per-circuit lists of counts[i] items."""
+    bounds = list(accumulate(counts, initial=0))
+    return [items[a:b] for a, b in zip(bounds, bounds[1:])]
+
+@timed("batch.evaluate_tramos")
+def evaluate_tramos(arrays, design_power, site, system, section=None):
+    """
+    evaluate_batch() for tramo arrays at the given design power.
+    `section` overrides arrays["section_mm2"] (used by sizing).
+    Adds "design_power" and "ib" to the returned dict.
+    """
+    ib = batch_ib(design_power, system["voltage"], system["pf"], system["oversizing"])
+    res = evaluate_batch(
+        ib, site["temp_ground"], arrays["depth"],
+        arrays["section_mm2"] if section is None else section,
+        site["resistivity_ground"], arrays["parallel_circuits"], arrays["spacing"],
+        arrays["install_type"], arrays["core_type"], arrays["insulation"],
+        arrays["conductor"], arrays["armour"], arrays["layout"]
+    )
+    res["design_power"] = design_power
+    res["ib"] = ib
+    return res
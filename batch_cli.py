@@ -0,0 +1,207 @@
+# batch_cli.py
+# Command-line batch evaluation of tramo inventories (CSV or Parquet).
+# Input is streamed in fixed-size chunks through the vectorized engine and
+# results are written incrementally, so memory stays bounded.
+#
+# Usage:
+#   python batch_cli.py tramos.csv resultados.csv --chunk-size 100000 --voltage 30
+#
+# Input columns are the tramo fields of the app (pb_power, install_type,
+# section_mm2, conductor, core_type, depth, parallel_circuits, spacing, ...).
+# Missing columns take the app defaults. An optional "circuit" column groups
+# consecutive rows into a circuit, along which pb_power accumulates.
+
+import argparse
+import csv
+import os
+import sys
+import time
+from itertools import islice
+
+import numpy as np
+import batch
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM
+
+CIRCUIT_COLUMN = "circuit"
+RESULT_COLUMNS = ["design_power", "ib", "k1", "k2", "k3", "k4", "base_iz", "iz_prime", "passed", "tables_hash"]
+
+# --- Readers ---
+
+def read_csv_chunks(path, chunk_size):
+    """Yield dicts column -> list of values, chunk_size rows at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield {name: [row[name] for row in rows] for name in reader.fieldnames}
+
+def read_parquet_chunks(path, chunk_size):
+    """Yield dicts column -> list of values, chunk_size rows at a time (needs pyarrow)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Se necesita pyarrow para leer archivos Parquet.")
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield record_batch.to_pydict()
+
+# --- Writers ---
+
+class CsvSink:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+
+    def write(self, columns):
+        if self._writer is None:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(columns.keys())
+        self._writer.writerows(zip(*columns.values()))
+
+    def close(self):
+        self._file.close()
+
+class ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Se necesita pyarrow para escribir archivos Parquet.")
+        self._pa, self._pq = pa, pq
+        self._path = path
+        self._writer = None
+
+    def write(self, columns):
+        table = self._pa.table({name: list(values) for name, values in columns.items()})
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+# --- Evaluation ---
+
+def cumulative_power(pb_power, circuit_ids, carry=None):
+    """
+    Design power per row: pb_power accumulated along consecutive rows of the
+    same circuit. carry = (circuit_id, cumulative power) of the previous
+    chunk's last row, so circuits can span chunk boundaries.
+    Returns (design_power, new carry).
+    """
+    if circuit_ids is None:
+        return pb_power.copy(), None
+    design = np.empty(len(pb_power))
+    starts = np.flatnonzero(np.r_[True, circuit_ids[1:] != circuit_ids[:-1]])
+    ends = np.r_[starts[1:], len(pb_power)]
+    for a, b in zip(starts, ends):
+        offset = 0.0
+        if a == 0 and carry is not None and carry[0] == circuit_ids[0]:
+            offset = carry[1]
+        design[a:b] = np.cumsum(np.r_[offset, pb_power[a:b]])[1:]
+    return design, (circuit_ids[-1], design[-1])
+
+def evaluate_chunk(columns, site, system, carry=None, first_row=1):
+    """
+    Evaluate one chunk of tramos (dict column -> list) whose first row is
+    row first_row of the input (for error messages).
+    Returns (result columns, carry for the next chunk).
+    """
+    n = len(next(iter(columns.values())))
+    arrays = batch.tramo_arrays(columns, first_row)
+
+    circuit_ids = np.asarray(columns[CIRCUIT_COLUMN]) if CIRCUIT_COLUMN in columns else None
+    design_power, carry = cumulative_power(arrays["pb_power"], circuit_ids, carry)
+
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+
+    out = dict(columns)
+    for name in RESULT_COLUMNS:
+        out[name] = np.broadcast_to(res[name], (n,)).tolist()
+    return out, carry
+
+def run(input_path, output_path, chunk_size=100_000, site=None, system=None, progress=sys.stderr):
+    """
+    Stream input_path through the engine into output_path. Returns the number
+    of rows. Raises ValueError (naming the offending row) on invalid input;
+    the partial output file is then removed.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+
+    reader = read_parquet_chunks if _is_parquet(input_path) else read_csv_chunks
+    sink = ParquetSink(output_path) if _is_parquet(output_path) else CsvSink(output_path)
+
+    total = 0
+    carry = None
+    t0 = time.perf_counter()
+    completed = False
+    try:
+        for columns in reader(input_path, chunk_size):
+            out, carry = evaluate_chunk(columns, site, system, carry, first_row=total + 1)
+            sink.write(out)
+            total += len(out[RESULT_COLUMNS[0]])
+            if progress is not None:
+                elapsed = time.perf_counter() - t0
+                rate = total / elapsed if elapsed > 0 else 0.0
+                print(f"{total:,} tramos procesados ({rate:,.0f} tramos/s)", file=progress)
+        completed = True
+    finally:
+        sink.close()
+        if not completed and os.path.exists(output_path):
+            os.remove(output_path)
+    return total
+
+# --- Command line ---
+
+def add_site_system_arguments(parser, temp_ground=True):
+    """Site and system options shared by the command-line tools."""
+    if temp_ground:
+        parser.add_argument("--temp-ground", type=float, default=DEFAULT_SITE["temp_ground"], help="Temperatura del terreno (ºC)")
+    parser.add_argument("--resistivity", type=float, default=DEFAULT_SITE["resistivity_ground"], help="Resistividad térmica (K·m/W)")
+    parser.add_argument("--voltage", type=float, default=DEFAULT_SYSTEM["voltage"], help="Tensión de operación (kV)")
+    parser.add_argument("--pf", type=float, default=DEFAULT_SYSTEM["pf"], help="Factor de potencia")
+    parser.add_argument("--oversizing", type=float, default=DEFAULT_SYSTEM["oversizing"], help="Sobredimensionamiento (%%)")
+
+def site_system(args):
+    """(site, system) from the options of add_site_system_arguments(), over the defaults."""
+    site = {**DEFAULT_SITE, "resistivity_ground": args.resistivity}
+    if getattr(args, "temp_ground", None) is not None:
+        site["temp_ground"] = args.temp_ground
+    system = {**DEFAULT_SYSTEM, "voltage": args.voltage, "pf": args.pf, "oversizing": args.oversizing}
+    return site, system
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo por lotes de ampacidad (IEC 60502-2).")
+    parser.add_argument("input", help="Archivo de tramos (.csv o .parquet)")
+    parser.add_argument("output", help="Archivo de resultados (.csv o .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Tramos por bloque")
+    add_site_system_arguments(parser)
+    parser.add_argument("--table-pack", help="Paquete de tablas alternativo (ver table_pack.py)")
+    parser.add_argument("--quiet", action="store_true", help="No mostrar progreso")
+    args = parser.parse_args(argv)
+
+    if args.table_pack:
+        from table_pack import use_pack
+        tables = use_pack(args.table_pack)
+        print(f"Tablas: {tables.name} ({tables.fingerprint[:12]})", file=sys.stderr)
+
+    site, system = site_system(args)
+
+    t0 = time.perf_counter()
+    try:
+        total = run(args.input, args.output, args.chunk_size, site, system,
+                    progress=None if args.quiet else sys.stderr)
+    except ValueError as e:
+        raise SystemExit(f"Error en los datos de entrada: {e}")
+    elapsed = time.perf_counter() - t0
+    print(f"Completado: {total:,} tramos en {elapsed:.2f} s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# benchmark.py
+# Benchmark suite for factor lookups and full-project evaluation.
+# Synthetic projects cover all four K3 tables (B.14 - B.17) and all four
+# K4 tables (B.18 - B.21).
+#
+# Usage:
+#   python benchmark.py --output bench.json
+#   python benchmark.py --output bench.json --baseline bench_baseline.json
+#   python benchmark.py --scales 10 1000 100000 1000000 --cases batch_project
+#   python benchmark.py --check-imports
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import batch
+import engine
+import parallel
+from calculations import get_k3, get_k4, get_ampacity_key, get_base_iz
+from data_tables import VALID_SECTIONS
+
+DEFAULT_SCALES = [10, 1_000, 100_000, 1_000_000]
+# Scalar (per-tramo Python) cases are capped unless --scales forces larger sizes
+SCALAR_MAX_SCALE = 100_000
+
+DEFAULT_TOLERANCE = 0.10  # 10 % throughput drop is a regression
+
+# The calculation core must import with the standard library only, within budget
+CORE_MODULES = ["data_tables", "compiled_tables", "calculations", "engine"]
+HEAVY_MODULES = ["numpy", "pandas", "streamlit"]
+DEFAULT_IMPORT_BUDGET_MS = 50.0
+
+# --- Synthetic inputs ---
+
+def synthetic_sections(n, seed=0):
+    """n tramo dicts cycling through every install type x core type combination."""
+    rng = random.Random(seed)
+    sections = []
+    for i in range(n):
+        sections.append({
+            **engine.DEFAULT_SECTION,
+            "pb_power": rng.uniform(500.0, 5000.0),
+            "install_type": batch.INSTALL_TYPES[i % 2],
+            "core_type": batch.CORE_TYPES[(i // 2) % 2],
+            "insulation": rng.choice(batch.INSULATIONS),
+            "conductor": rng.choice(batch.CONDUCTORS),
+            "layout": rng.choice(batch.LAYOUTS),
+            "armour": rng.random() < 0.5,
+            "section_mm2": rng.choice(VALID_SECTIONS),
+            "depth": rng.uniform(0.5, 3.0),
+            "parallel_circuits": rng.randint(1, 12),
+            "spacing": rng.choice([0.0, 200.0, 400.0, 600.0, 800.0, rng.uniform(0.0, 800.0)]),
+        })
+    return sections
+
+def synthetic_project(n, seed=0, tramos_per_circuit=5):
+    sections = synthetic_sections(n, seed)
+    return [
+        {"sections": sections[i:i + tramos_per_circuit]}
+        for i in range(0, n, tramos_per_circuit)
+    ]
+
+def synthetic_arrays(n, seed=0):
+    """Tramo arrays (batch.tramo_arrays layout) generated directly with NumPy."""
+    rng = np.random.default_rng(seed)
+    idx = np.arange(n)
+    spacing = rng.choice([0.0, 200.0, 400.0, 600.0, 800.0], n)
+    return {
+        "pb_power": rng.uniform(500.0, 5000.0, n),
+        "section_mm2": rng.choice(np.array(VALID_SECTIONS, dtype=float), n),
+        "length": np.full(n, engine.DEFAULT_SECTION["length"]),
+        "parallel_circuits": rng.integers(1, 13, n).astype(float),
+        "spacing": np.where(rng.random(n) < 0.2, rng.uniform(0.0, 800.0, n), spacing),
+        "depth": rng.uniform(0.5, 3.0, n),
+        "install_type": idx % 2,
+        "core_type": (idx // 2) % 2,
+        "insulation": rng.integers(0, len(batch.INSULATIONS), n),
+        "conductor": rng.integers(0, len(batch.CONDUCTORS), n),
+        "layout": rng.integers(0, len(batch.LAYOUTS), n),
+        "armour": rng.random(n) < 0.5,
+    }
+
+# --- Cases ---
+# Each case: setup(n) -> state; run(state) -> latencies (s) of its timed units
+
+def _per_call(calls):
+    latencies = []
+    clock = time.perf_counter
+    for func, args in calls:
+        t0 = clock()
+        func(*args)
+        latencies.append(clock() - t0)
+    return latencies
+
+def _setup_k3(n):
+    return [(get_k3, (1.5, s["install_type"], s["core_type"], s["section_mm2"]))
+            for s in synthetic_sections(n)]
+
+def _setup_k4(n):
+    return [(get_k4, (s["parallel_circuits"], s["spacing"], s["install_type"], s["core_type"]))
+            for s in synthetic_sections(n)]
+
+def _ampacity_lookup(s):
+    key = get_ampacity_key(s["insulation"], s["conductor"], s["core_type"],
+                           s["install_type"], s["armour"], s["layout"])
+    return get_base_iz(key, s["section_mm2"])
+
+def _setup_ampacity(n):
+    return [(_ampacity_lookup, (s,)) for s in synthetic_sections(n)]
+
+def _run_project(circuits):
+    t0 = time.perf_counter()
+    engine.evaluate_project(circuits)
+    return [time.perf_counter() - t0]
+
+def _run_parallel(circuits):
+    t0 = time.perf_counter()
+    parallel.evaluate_project_parallel(circuits)
+    return [time.perf_counter() - t0]
+
+def _run_batch(arrays):
+    t0 = time.perf_counter()
+    batch.evaluate_tramos(arrays, arrays["pb_power"], engine.DEFAULT_SITE, engine.DEFAULT_SYSTEM)
+    return [time.perf_counter() - t0]
+
+CASES = {
+    # name: (setup, run, scalar)
+    "get_k3": (_setup_k3, _per_call, True),
+    "get_k4": (_setup_k4, _per_call, True),
+    "ampacity_lookup": (_setup_ampacity, _per_call, True),
+    "evaluate_project": (synthetic_project, _run_project, True),
+    "parallel_project": (synthetic_project, _run_parallel, True),
+    "batch_project": (synthetic_arrays, _run_batch, False),
+}
+
+# --- Runner ---
+
+def _percentiles(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_us": p50 * 1e6, "p95_us": p95 * 1e6, "p99_us": p99 * 1e6}
+
+def run_case(name, n, repeat=3):
+    """Run one case at scale n. Returns a result dict."""
+    setup, run, _ = CASES[name]
+    state = setup(n)
+    run(state)  # warm-up
+
+    latencies = []
+    total = 0.0
+    for _ in range(repeat):
+        lat = run(state)
+        latencies.extend(lat)
+        total += sum(lat)
+
+    # Peak memory from a separate, untimed run (tracemalloc slows execution)
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "tramos": n,
+        "repeat": repeat,
+        "throughput_per_s": n * repeat / total if total > 0 else float("inf"),
+        **_percentiles(latencies),
+        "peak_memory_mb": peak / 2**20,
+    }
+
+def run_suite(cases=None, scales=None, repeat=3, progress=sys.stderr):
+    explicit_scales = scales is not None
+    scales = scales or DEFAULT_SCALES
+    results = {}
+    for name in cases or CASES:
+        scalar = CASES[name][2]
+        for n in scales:
+            if scalar and n > SCALAR_MAX_SCALE and not explicit_scales:
+                continue
+            res = run_case(name, n, repeat)
+            results[f"{name}@{n}"] = res
+            if progress is not None:
+                print(f"{name:>18} n={n:>9,}  {res['throughput_per_s']:>14,.0f} /s  "
+                      f"p50={res['p50_us']:.2f} us  p99={res['p99_us']:.2f} us  "
+                      f"peak={res['peak_memory_mb']:.1f} MB", file=progress)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Throughput regressions of current vs baseline (dicts as from run_suite).
+    Returns a list of (case, baseline throughput, current throughput, change).
+    """
+    regressions = []
+    for key, res in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        change = res["throughput_per_s"] / base["throughput_per_s"] - 1.0
+        if change < -tolerance:
+            regressions.append((key, base["throughput_per_s"], res["throughput_per_s"], change))
+    return regressions
+
+# --- Import time ---
+
+def measure_core_import(runs=5):
+    """
+    Import CORE_MODULES in fresh interpreters.
+    Returns (best time in ms, heavy modules that got imported).
+    """
+    code = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {', '.join(CORE_MODULES)}\n"
+        "print((time.perf_counter() - t0) * 1e3)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = float("inf"), []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.splitlines()
+        best = min(best, float(out[0]))
+        heavy = [m for m in out[1].split(",") if m] if len(out) > 1 else []
+    return best, heavy
+
+def check_import_budget(budget_ms=DEFAULT_IMPORT_BUDGET_MS):
+    """True when the core imports within budget_ms and without heavy modules."""
+    elapsed, heavy = measure_core_import()
+    print(f"Importación del núcleo: {elapsed:.1f} ms (límite {budget_ms:.0f} ms)", file=sys.stderr)
+    if heavy:
+        print(f"ERROR: el núcleo importa {', '.join(heavy)}", file=sys.stderr)
+    elif elapsed > budget_ms:
+        print("ERROR: se supera el tiempo de importación permitido", file=sys.stderr)
+    return not heavy and elapsed <= budget_ms
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de cálculo de ampacidad.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), help="Casos a ejecutar (por defecto, todos)")
+    parser.add_argument("--scales", nargs="+", type=int, help="Número de tramos (por defecto 10 1000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    parser.add_argument("--baseline", help="JSON de referencia para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Caída de rendimiento tolerada (0.10 = 10%%)")
+    parser.add_argument("--check-imports", action="store_true", help="Solo comprobar el tiempo de importación del núcleo")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET_MS, help="Límite de importación (ms)")
+    args = parser.parse_args(argv)
+
+    if args.check_imports:
+        return 0 if check_import_budget(args.import_budget) else 1
+
+    current = run_suite(args.cases, args.scales, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        for key, before, after, change in regressions:
+            print(f"REGRESIÓN {key}: {before:,.0f} -> {after:,.0f} /s ({change:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Sin regresiones respecto a la referencia.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# capacity.py
+# Reverse calculation: the maximum power each tramo can carry (inverting
+# calculate_ib at Iz') and the spare capacity left after the cumulative
+# upstream load, per tramo and per circuit.
+
+import math
+
+import numpy as np
+import batch
+import compiled_tables
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM
+from instrumentation import timed
+
+def max_power(iz_prime, voltage_kv, pf, oversizing_pct):
+    """Maximum power (kVA) for a current Iz' (A): inverse of calculate_ib, vectorized."""
+    return np.asarray(iz_prime) * math.sqrt(3) * voltage_kv * pf / (1 + oversizing_pct/100)
+
+def _circuit_matrix(values, counts, fill):
+    """
+    Scatter flat per-tramo values into a (circuits, longest circuit) matrix
+    padded with fill. Returns (matrix, row index, column index) per tramo.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    cols = np.arange(len(rows)) - np.repeat(starts, counts)
+    matrix = np.full((len(counts), max(counts.max(initial=0), 1)), fill, dtype=float)
+    matrix[rows, cols] = values
+    return matrix, rows, cols
+
+@timed("capacity.capacity_tramos")
+def capacity_tramos(arrays, design_power, counts, site, system):
+    """
+    Capacity of every tramo in one vectorized pass.
+    design_power is the cumulative load of each tramo; counts the tramos
+    per circuit (batch.project_arrays). Returns dict of arrays:
+      per tramo:   iz_prime, ib, design_power, max_power, spare
+                   (max_power - design_power) and headroom (extra power
+                   that can be connected at the tramo: it loads this tramo
+                   and every later one, so the minimum spare from here on)
+      per circuit: circuit_spare (headroom at the first tramo, NaN for
+                   empty circuits) and limiting_tramo (index of the
+                   tramo with the least spare, -1 for empty circuits)
+    """
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+    n = len(design_power)
+    iz_prime = np.broadcast_to(res["iz_prime"], (n,))
+    p_max = max_power(iz_prime, system["voltage"], system["pf"], system["oversizing"])
+    spare = p_max - design_power
+
+    matrix, rows, cols = _circuit_matrix(spare, counts, np.inf)
+    suffix_min = np.minimum.accumulate(matrix[:, ::-1], axis=1)[:, ::-1]
+    empty = np.asarray(counts) == 0
+    return {
+        "iz_prime": iz_prime,
+        "ib": res["ib"],
+        "design_power": design_power,
+        "max_power": p_max,
+        "spare": spare,
+        "headroom": suffix_min[rows, cols],
+        "circuit_spare": np.where(empty, np.nan, suffix_min[:, 0]),
+        "limiting_tramo": np.where(empty, -1, np.argmin(matrix, axis=1)),
+    }
+
+def capacity_project(circuits, site=None, system=None):
+    """
+    Capacity of a project (circuits as in the app session).
+    Returns one dict per circuit:
+    {"spare", "limiting_tramo", "tramos": [{"design_power", "ib", "iz_prime",
+     "max_power", "spare", "headroom", "tables_hash"}, ...]}
+    with spare None and limiting_tramo None for empty circuits.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+
+    arrays, design_power, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return [{"spare": None, "limiting_tramo": None, "tramos": []} for _ in circuits]
+    return capacity_project_arrays(arrays, design_power, counts, site, system)
+
+def capacity_project_arrays(arrays, design_power, counts, site, system):
+    """capacity_project() for tramo arrays grouped by circuit (counts tramos per circuit)."""
+    tables_hash = compiled_tables.TABLES.fingerprint
+    cap = capacity_tramos(arrays, design_power, counts, site, system)
+
+    fields = ["design_power", "ib", "iz_prime", "max_power", "spare", "headroom"]
+    columns = [cap[name].tolist() for name in fields]
+    records = [{**dict(zip(fields, row)), "tables_hash": tables_hash} for row in zip(*columns)]
+
+    return [
+        {
+            "spare": None if not tramos else float(cap["circuit_spare"][i]),
+            "limiting_tramo": None if not tramos else int(cap["limiting_tramo"][i]),
+            "tramos": tramos,
+        }
+        for i, tramos in enumerate(batch.split_by_counts(records, counts))
+    ]
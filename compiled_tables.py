@@ -0,0 +1,195 @@
+# compiled_tables.py
+# Correction-factor tables (B.11 - B.21) compiled once into sorted breakpoint
+# tuples so single lookups bracket with bisect instead of sorting per call.
+# Also holds the active table set (built-in tables or a loaded table pack).
+
+import hashlib
+import json
+from bisect import bisect_left
+from functools import cached_property
+from data_tables import (
+    VALID_SECTIONS, AMPACITY_DB,
+    TABLE_B11, TABLE_B12, TABLE_B13,
+    TABLE_B14, TABLE_B15, TABLE_B16, TABLE_B17,
+    TABLE_B18_DATA, TABLE_B19_DATA, TABLE_B20_DATA, TABLE_B21_DATA
+)
+
+def interpolate_linear(x, x1, y1, x2, y2):
+    """Linear interpolation."""
+    if x2 == x1: return y1
+    return y1 + (x - x1) * (y2 - y1) / (x2 - x1)
+
+def bracket(keys, x):
+    """
+    Index i of the interval keys[i]..keys[i+1] used for x.
+    First interval containing x, or the end intervals when x is out of range
+    (values are then extrapolated, as the original per-call search did).
+    """
+    i = bisect_left(keys, x) - 1
+    if i < 0:
+        return 0
+    last = len(keys) - 2
+    return last if i > last else i
+
+class Curve:
+    """Sorted breakpoints of a 1-D factor curve."""
+    __slots__ = ("keys", "values")
+
+    def __init__(self, points):
+        self.keys = tuple(sorted(points))
+        self.values = tuple(points[k] for k in self.keys)
+
+    def __call__(self, x):
+        keys = self.keys
+        if len(keys) == 1:
+            return self.values[0]
+        i = bracket(keys, x)
+        return interpolate_linear(x, keys[i], self.values[i], keys[i+1], self.values[i+1])
+
+class K3Table:
+    """
+    Resistivity curves of one K3 table, one per section.
+    Curves for every VALID_SECTIONS entry are built up front, interpolating
+    between table sections where needed.
+    """
+    __slots__ = ("name", "sections", "curves", "_table")
+
+    def __init__(self, name, table):
+        self.name = name
+        self.sections = tuple(sorted(table))
+        self.curves = {s: Curve(table[s]) for s in self.sections}
+        for s in VALID_SECTIONS:
+            if self.sections[0] < s < self.sections[-1] and s not in self.curves:
+                self.curves[s] = self._interpolated_curve(table, s)
+        self._table = table
+
+    def _interpolated_curve(self, table, section):
+        i = bracket(self.sections, section)
+        s1, s2 = self.sections[i], self.sections[i+1]
+        return Curve({
+            r: interpolate_linear(section, s1, table[s1][r], s2, table[s2][r])
+            for r in sorted(table[s1])
+        })
+
+    def curve_for(self, section):
+        if section <= self.sections[0]:
+            return self.curves[self.sections[0]]
+        if section >= self.sections[-1]:
+            return self.curves[self.sections[-1]]
+        curve = self.curves.get(section)
+        if curve is None:
+            # Non-standard section: interpolate on demand
+            curve = self._interpolated_curve(self._table, section)
+        return curve
+
+class K4Table:
+    """Spacing curves of one K4 table, one per circuit count, without undefined (None) spacings."""
+    __slots__ = ("name", "circuits", "rows")
+
+    def __init__(self, name, table):
+        self.name = name
+        self.circuits = tuple(sorted(table))
+        self.rows = {}
+        for n in self.circuits:
+            valid = {s: v for s, v in table[n].items() if v is not None}
+            self.rows[n] = Curve(valid) if valid else None
+
+# Names of the raw tables making up a table set
+TABLE_NAMES = ["B11", "B12", "B13", "B14", "B15", "B16", "B17", "B18", "B19", "B20", "B21"]
+
+def builtin_tables():
+    """The tables of data_tables.py as a raw table set: {"sections": ..., "ampacity": ..., "B11": ..., ...}."""
+    return {
+        "sections": VALID_SECTIONS,
+        "ampacity": AMPACITY_DB,
+        "B11": TABLE_B11, "B12": TABLE_B12, "B13": TABLE_B13,
+        "B14": TABLE_B14, "B15": TABLE_B15, "B16": TABLE_B16, "B17": TABLE_B17,
+        "B18": TABLE_B18_DATA, "B19": TABLE_B19_DATA, "B20": TABLE_B20_DATA, "B21": TABLE_B21_DATA,
+    }
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return sorted([float(k), _canonical(v)] for k, v in value.items())
+    if isinstance(value, (tuple, list)):
+        return [_canonical(v) for v in value]
+    return None if value is None else float(value)
+
+def tables_fingerprint(raw):
+    """
+    SHA-256 of the table content (independent of key types and ordering),
+    identifying the table set a result was computed with.
+    """
+    canon = {
+        "ampacity": sorted(
+            [list(key), record["source"], _canonical(record["data"])]
+            for key, record in raw["ampacity"].items()
+        ),
+    }
+    for name in TABLE_NAMES:
+        canon[name] = _canonical(raw[name])
+    text = json.dumps(canon, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def table_sections(ampacity):
+    """Sorted sections tabulated in an AMPACITY_DB-style dict."""
+    return sorted({s for record in ampacity.values() for s in record["data"]})
+
+class CompiledTables:
+    """All tables of a table set in compiled form."""
+
+    def __init__(self, raw, name="IEC 60502-2 (data_tables.py)", arrays=None):
+        b11, b12, b13 = raw["B11"], raw["B12"], raw["B13"]
+        self.name = name
+        self.raw = raw
+        # Optional NumPy arrays of the same tables (memory-mapped from a table pack)
+        self.arrays = arrays
+        # Base ampacity: AMPACITY_DB-style dict
+        self.ampacity = raw["ampacity"]
+        # Conductor sections of the set (a catalogue may add e.g. 500 or 630 mm²)
+        self.sections = tuple(raw.get("sections") or table_sections(self.ampacity))
+        # K1: EPR/HEPR/XLPE column (90°C)
+        self.k1 = Curve({t: v[1] for t, v in b11.items()})
+        # K2: (table name, curve for section <= 185, curve for section > 185)
+        self.k2 = {
+            True: ("Table B.12", Curve({d: v[0] for d, v in b12.items()}),
+                   Curve({d: v[1] for d, v in b12.items()})),
+            False: ("Table B.13", Curve({d: v[0] for d, v in b13.items()}),
+                    Curve({d: v[1] for d, v in b13.items()})),
+        }
+        # K3 / K4 keyed by (is_single, is_direct)
+        self.k3 = {
+            (True, True): K3Table("Table B.14", raw["B14"]),
+            (True, False): K3Table("Table B.15", raw["B15"]),
+            (False, True): K3Table("Table B.16", raw["B16"]),
+            (False, False): K3Table("Table B.17", raw["B17"]),
+        }
+        self.k4 = {
+            (True, True): K4Table("Table B.19", raw["B19"]),
+            (True, False): K4Table("Table B.21", raw["B21"]),
+            (False, True): K4Table("Table B.18", raw["B18"]),
+            (False, False): K4Table("Table B.20", raw["B20"]),
+        }
+
+    @cached_property
+    def fingerprint(self):
+        # Hashed on first use, not at import
+        return tables_fingerprint(self.raw)
+
+TABLES = CompiledTables(builtin_tables())
+
+_listeners = []
+
+def on_tables_changed(callback):
+    """Register callback(tables) to run whenever use_tables() switches the active set."""
+    _listeners.append(callback)
+
+def use_tables(tables):
+    """
+    Make a CompiledTables the active table set for every calculation.
+    Pass None to go back to the built-in tables.
+    """
+    global TABLES
+    TABLES = tables if tables is not None else CompiledTables(builtin_tables())
+    for callback in _listeners:
+        callback(TABLES)
+    return TABLES
@@ -1,8 +1,7 @@
 
 # data_tables.py
 # This file contains hardcoded data tables based on IEC 60502-2.
-
-import pandas as pd
+# Standard library only: imported by the calculation core and batch workers.
 
 # --- General Parameters ---
 MAX_TEMPERATURES = {
@@ -11,8 +10,49 @@ MAX_TEMPERATURES = {
     "XLPE": 90
 }
 
+# Maximum conductor temperature during a short circuit (IEC 60502-2), ºC
+SHORT_CIRCUIT_TEMPERATURES = {
+    "EPR": 250,
+    "HEPR": 250,
+    "XLPE": 250
+}
+
 VALID_SECTIONS = [10, 16, 25, 35, 50, 70, 95, 120, 150, 185, 240, 300, 400]
 
+# --- Conductor Data (voltage drop and losses) ---
+# IEC 60228: maximum DC resistance of class 2 (stranded) conductors at 20 ºC, ohm/km
+CONDUCTOR_RESISTANCE_20C = {
+    "Cu": {10: 1.83, 16: 1.15, 25: 0.727, 35: 0.524, 50: 0.387, 70: 0.268, 95: 0.193,
+           120: 0.153, 150: 0.124, 185: 0.0991, 240: 0.0754, 300: 0.0601, 400: 0.0470},
+    "Al": {10: 3.08, 16: 1.91, 25: 1.20, 35: 0.868, 50: 0.641, 70: 0.443, 95: 0.320,
+           120: 0.253, 150: 0.206, 185: 0.164, 240: 0.125, 300: 0.100, 400: 0.0778},
+}
+
+# Temperature coefficient of resistance at 20 ºC (IEC 60287-1-1), 1/K
+RESISTANCE_TEMP_COEFF = {
+    "Cu": 3.93e-3,
+    "Al": 4.03e-3,
+}
+
+# Typical positive-sequence reactance of 18/30 kV cables at 50 Hz, ohm/km
+# (approximate; the exact value depends on the cable geometry)
+# Structure: (core_type, layout) -> reactance; layout is None for Three Core
+TYPICAL_REACTANCE_50HZ = {
+    ("Single Core", "Trefoil"): 0.12,
+    ("Single Core", "Flat spaced"): 0.19,
+    ("Single Core", "Flat touching ducts"): 0.17,
+    ("Three Core", None): 0.11,
+}
+
+# Adiabatic short-circuit constants (IEC 60949, Table 1)
+#   beta: reciprocal of the temperature coefficient at 0 ºC, K
+#   heat_capacity: volumetric specific heat, J/(K·m³)
+#   resistivity_20: electrical resistivity at 20 ºC, ohm·m
+ADIABATIC_CONSTANTS = {
+    "Cu": {"beta": 234.5, "heat_capacity": 3.45e6, "resistivity_20": 1.7241e-8},
+    "Al": {"beta": 228.0, "heat_capacity": 2.5e6, "resistivity_20": 2.8264e-8},
+}
+
 # --- Ampacity Tables (Base Iz) ---
 # CORRECTED Complete ampacity database from IEC 60502-2 Tables B.2 to B.9
 # Structure: (insulation, conductor, core_type, installation, armoring, layout) -> {data, source}
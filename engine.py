@@ -0,0 +1,213 @@
+# engine.py
+# Headless project evaluation: the calculation pipeline behind the app's
+# "Calcular Ampacidad" button, callable without Streamlit.
+
+from itertools import accumulate
+import compiled_tables
+from calculations import (
+    get_k1, get_k2, get_k3, get_k4, calculate_ib,
+    get_ampacity_key, get_base_iz
+)
+from instrumentation import timed
+
+# Pipeline stages, timed while an instrumentation recorder is active
+calculate_ib = timed("calculate_ib")(calculate_ib)
+get_k1 = timed("get_k1")(get_k1)
+get_k2 = timed("get_k2")(get_k2)
+get_k3 = timed("get_k3")(get_k3)
+get_k4 = timed("get_k4")(get_k4)
+get_ampacity_key = timed("ampacity_key")(get_ampacity_key)
+get_base_iz = timed("ampacity_lookup")(get_base_iz)
+
+# Default tramo, as created by "Añadir Tramo"
+DEFAULT_SECTION = {
+    "pb_power": 10120.0,
+    "install_type": "Directamente enterrado",
+    "insulation": "XLPE",
+    "section_mm2": 400,
+    "conductor": "Al",
+    "voltage_u0": "18/30 (36) kV",
+    "layout": "Trefoil",
+    "armour": False,
+    "core_type": "Single Core",
+    "veins": 1,
+    "length": 10061.0,
+    "parallel_circuits": 4, # n circuits in group
+    "spacing": 200.0,
+    "depth": 0.8
+}
+
+# Default parameters (same as the app sidebar)
+DEFAULT_SITE = {
+    "temp_ground": 20.0,         # ºC
+    "resistivity_ground": 1.5,   # K·m/W
+}
+
+DEFAULT_SYSTEM = {
+    "voltage": 30.0,      # kV
+    "frequency": 50.0,    # Hz
+    "pf": 0.9,
+    "oversizing": 0.0,    # %
+}
+
+# Tramo fields that affect K1..K4 and base Iz (pb_power only affects Ib)
+FACTOR_FIELDS = (
+    "insulation", "conductor", "core_type", "install_type", "armour", "layout",
+    "section_mm2", "depth", "parallel_circuits", "spacing"
+)
+
+def evaluate_section_factors(section, site):
+    """
+    Power-independent part of a tramo evaluation: K1..K4, base Iz and Iz'.
+    Returns a dict.
+    """
+    temp_ground = site["temp_ground"]
+    resistivity_ground = site["resistivity_ground"]
+
+    # 2. Get Factors
+    k1, src_k1 = get_k1(temp_ground, section["insulation"])
+    k2, src_k2 = get_k2(section["depth"], section["section_mm2"], section["install_type"])
+    k3, src_k3 = get_k3(resistivity_ground, section["install_type"], section["core_type"], section["section_mm2"])
+    k4, src_k4 = get_k4(section["parallel_circuits"], section["spacing"], section["install_type"], section["core_type"])
+
+    # 3. Base Ampacity (Iz)
+    error = None
+    try:
+        db_key = get_ampacity_key(
+            section["insulation"], section["conductor"], section["core_type"],
+            section["install_type"], section["armour"], section.get("layout", "Trefoil")
+        )
+        base_iz, source_table = get_base_iz(db_key, section["section_mm2"])
+        if base_iz == 0:
+            error = "not_found"
+    except Exception as e:
+        base_iz = 0
+        source_table = "Error"
+        error = f"Error lookup: {e}"
+
+    # 4. Corrected Iz'
+    iz_prime = base_iz * k1 * k2 * k3 * k4
+
+    return {
+        "k1": k1, "k2": k2, "k3": k3, "k4": k4,
+        "src_k1": src_k1, "src_k2": src_k2, "src_k3": src_k3, "src_k4": src_k4,
+        "base_iz": base_iz,
+        "source_table": source_table,
+        "iz_prime": iz_prime,
+        "error": error,
+        "tables_hash": compiled_tables.TABLES.fingerprint,
+    }
+
+def verify_section(factors, design_power, system):
+    """Combine tramo factors with the design power: Ib and verification."""
+    # 1. Calc Ib
+    ib = calculate_ib(design_power, system["voltage"], system["pf"], system["oversizing"])
+
+    # 5. Verification
+    return {
+        "design_power": design_power,
+        "ib": ib,
+        **factors,
+        "passed": ib <= factors["iz_prime"],
+    }
+
+def evaluate_section(section, design_power, site, system):
+    """
+    Evaluate one tramo for the given cumulative design power.
+    Returns a result record (dict).
+    """
+    return verify_section(evaluate_section_factors(section, site), design_power, system)
+
+def evaluate_circuit(sections, site, system):
+    """Evaluate all tramos of a circuit; power accumulates along the tramos."""
+    design_powers = accumulate(section["pb_power"] for section in sections)
+    return [
+        evaluate_section(section, power, site, system)
+        for section, power in zip(sections, design_powers)
+    ]
+
+def evaluate_project(circuits, site=None, system=None):
+    """
+    Evaluate every circuit of a project.
+    circuits: list of {"sections": [tramo dict, ...]} as kept in the app session.
+    site / system: dicts as DEFAULT_SITE / DEFAULT_SYSTEM (missing keys use defaults).
+    Returns one list of result records per circuit, in input order.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    return [evaluate_circuit(circuit["sections"], site, system) for circuit in circuits]
+
+class IncrementalEvaluator:
+    """
+    evaluate_project() that reuses results between calls.
+    Tramos are matched by position (circuit, tramo). A tramo whose factor
+    inputs (FACTOR_FIELDS, site or active tables) changed is fully recomputed; one whose
+    design power or system changed (e.g. an upstream pb_power edit) only
+    gets Ib and the verification refreshed; anything else is reused.
+    store: optional persistent factor store (result_cache.ResultCache);
+    tramos it already holds are loaded instead of recomputed.
+    """
+
+    def __init__(self, store=None):
+        self._entries = {}
+        self.store = store
+        self.stats = {"recomputed": 0, "ib_refreshed": 0, "reused": 0, "from_store": 0}
+
+    def clear(self):
+        self._entries = {}
+
+    def evaluate(self, circuits, site=None, system=None):
+        site = {**DEFAULT_SITE, **(site or {})}
+        system = {**DEFAULT_SYSTEM, **(system or {})}
+        site_key = (site["temp_ground"], site["resistivity_ground"], compiled_tables.TABLES.fingerprint)
+        system_key = (system["voltage"], system["pf"], system["oversizing"])
+
+        stats = {"recomputed": 0, "ib_refreshed": 0, "reused": 0, "from_store": 0}
+        entries = {}
+        results = []
+        # Tramos whose factors must be loaded or computed:
+        # (position, tramo, factor key, power key, design power)
+        pending = []
+        for i, circuit in enumerate(circuits):
+            sections = circuit["sections"]
+            records = []
+            for j, (section, power) in enumerate(zip(sections, accumulate(s["pb_power"] for s in sections))):
+                factor_key = (site_key,) + tuple(section.get(f) for f in FACTOR_FIELDS)
+                power_key = (power, system_key)
+                prev = self._entries.get((i, j))
+
+                if prev is not None and prev[0] == factor_key:
+                    factors = prev[1]
+                    if prev[2] == power_key:
+                        record = prev[3]
+                        stats["reused"] += 1
+                    else:
+                        record = verify_section(factors, power, system)
+                        stats["ib_refreshed"] += 1
+                    entries[(i, j)] = (factor_key, factors, power_key, record)
+                else:
+                    record = None
+                    pending.append(((i, j), section, factor_key, power_key, power))
+                records.append(record)
+            results.append(records)
+
+        if pending:
+            pending_sections = [p[1] for p in pending]
+            stored = self.store.get_factors(pending_sections, site) if self.store is not None else [None] * len(pending)
+            computed = []
+            for ((i, j), section, factor_key, power_key, power), factors in zip(pending, stored):
+                if factors is None:
+                    factors = evaluate_section_factors(section, site)
+                    computed.append((section, factors))
+                    stats["recomputed"] += 1
+                else:
+                    stats["from_store"] += 1
+                record = verify_section(factors, power, system)
+                entries[(i, j)] = (factor_key, factors, power_key, record)
+                results[i][j] = record
+            if self.store is not None and computed:
+                self.store.put_factors([c[0] for c in computed], site, [c[1] for c in computed])
+
+        self._entries = entries
+        self.stats = stats
+        return results
@@ -0,0 +1,122 @@
+# instrumentation.py
+# Per-stage timers and call counters for the calculation pipeline, plus an
+# optional cProfile capture.
+#
+# Stats go to a Recorder, made active for the current context (thread or
+# task) with activate() or recording(). Nothing is patched and nothing is
+# shared: each app session keeps its own Recorder, and contexts without one
+# are not timed. Pipeline functions are marked with @timed(stage), whose
+# cost when no recorder is active is one context-variable lookup.
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+_active = ContextVar("instrumentation_recorder", default=None)
+
+class Recorder:
+    """Stage counters: stage -> [calls, total seconds, max seconds]."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                self._stats[name] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        """Per-stage counters: {stage: {calls, total_ms, mean_us, max_us}}."""
+        with self._lock:
+            return {
+                name: {
+                    "calls": calls,
+                    "total_ms": total * 1e3,
+                    "mean_us": total / calls * 1e6,
+                    "max_us": worst * 1e6,
+                }
+                for name, (calls, total, worst) in sorted(self._stats.items(), key=lambda kv: -kv[1][1])
+            }
+
+    def dump_json(self, path=None):
+        """Stage counters as JSON text; also written to path if given."""
+        import json
+        text = json.dumps({"stages": self.snapshot()}, indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+def activate(recorder):
+    """Make recorder the active one in the current context (None stops timing)."""
+    _active.set(recorder)
+
+def active():
+    return _active.get()
+
+@contextmanager
+def recording(recorder=None):
+    """Time the enclosed block into recorder (a new one if not given)."""
+    recorder = recorder or Recorder()
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+
+def timed(name):
+    """Decorator: time each call as stage name while a recorder is active."""
+    clock = time.perf_counter
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _active.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.record(name, clock() - t0)
+        return wrapper
+    return decorate
+
+@contextmanager
+def stage(name):
+    """Time an arbitrary block (e.g. rendering) as a stage when a recorder is active."""
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(name, time.perf_counter() - t0)
+
+def profile_call(func, *args, top=30, **kwargs):
+    """
+    Run func under cProfile.
+    Returns (result, report text sorted by cumulative time).
+    """
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return result, out.getvalue()
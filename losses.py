@@ -0,0 +1,138 @@
+# losses.py
+# Voltage drop and Joule losses along each circuit, vectorized over all
+# tramos. Conductors are taken at their maximum operating temperature
+# (MAX_TEMPERATURES), so both results are on the conservative side.
+
+import math
+
+import numpy as np
+import batch
+import compiled_tables
+from data_tables import (
+    CONDUCTOR_RESISTANCE_20C, RESISTANCE_TEMP_COEFF, MAX_TEMPERATURES,
+    TYPICAL_REACTANCE_50HZ, VALID_SECTIONS
+)
+from engine import DEFAULT_SYSTEM
+from instrumentation import timed
+
+SECTIONS = np.array(VALID_SECTIONS, dtype=float)
+
+# Lookup arrays in the category orders of batch.py
+R20 = np.array([[CONDUCTOR_RESISTANCE_20C[c][s] for s in VALID_SECTIONS] for c in batch.CONDUCTORS])
+ALPHA = np.array([RESISTANCE_TEMP_COEFF[c] for c in batch.CONDUCTORS])
+MAX_TEMP = np.array([MAX_TEMPERATURES[i] for i in batch.INSULATIONS], dtype=float)
+# [core, layout]; Three Core cables have no layout
+X50 = np.array([
+    [TYPICAL_REACTANCE_50HZ[("Single Core", layout)] for layout in batch.LAYOUTS],
+    [TYPICAL_REACTANCE_50HZ[("Three Core", None)]] * len(batch.LAYOUTS),
+])
+
+def ac_resistance(conductor, section, insulation, frequency):
+    """
+    AC resistance (ohm/km) at the maximum conductor temperature, with the
+    IEC 60287-1-1 skin effect (ks = 1; proximity effect neglected).
+    NaN for sections not in VALID_SECTIONS.
+    """
+    conductor = np.asarray(conductor)
+    s = np.asarray(section, dtype=float)
+    si = np.minimum(np.searchsorted(SECTIONS, s), len(SECTIONS) - 1)
+    r_dc = R20[conductor, si] * (1 + ALPHA[conductor] * (MAX_TEMP[np.asarray(insulation)] - 20))
+    xs2 = 8 * math.pi * frequency / (r_dc * 1e-3) * 1e-7
+    ys = xs2**2 / (192 + 0.8 * xs2**2)
+    return np.where(SECTIONS[si] == s, r_dc * (1 + ys), np.nan)
+
+def reactance(core, layout, frequency):
+    """Typical positive-sequence reactance (ohm/km) scaled to the frequency."""
+    return X50[np.asarray(core), np.asarray(layout)] * frequency / 50.0
+
+def segmented_cumsum(values, counts):
+    """
+    Prefix sums restarting at every circuit.
+    Returns (running sum per tramo, total per circuit).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    cs = np.concatenate([[0.0], np.cumsum(values)])
+    ends = np.cumsum(counts)
+    before = cs[ends - counts]
+    return cs[1:] - np.repeat(before, counts), cs[ends] - before
+
+@timed("losses.losses_tramos")
+def losses_tramos(arrays, design_power, counts, system, reactance_ohm_km=None):
+    """
+    Voltage drop and Joule losses of every tramo at its design current Ib.
+    arrays: tramo arrays (batch.tramo_arrays), length in m; counts: tramos
+    per circuit. reactance_ohm_km overrides the typical reactance.
+    Returns dict of arrays:
+      per tramo:   ib, resistance, reactance (ohm/km), voltage_drop (V),
+                   voltage_drop_pct, cumulative_drop (V) and
+                   cumulative_drop_pct from the circuit origin to the end
+                   of the tramo, losses_kw, cumulative_losses_kw
+      per circuit: circuit_drop_pct, circuit_losses_kw
+    """
+    f, pf = system["frequency"], system["pf"]
+    ib = batch.batch_ib(design_power, system["voltage"], pf, system["oversizing"])
+    r = ac_resistance(arrays["conductor"], arrays["section_mm2"], arrays["insulation"], f)
+    if reactance_ohm_km is None:
+        x = reactance(arrays["core_type"], arrays["layout"], f)
+    else:
+        x = np.broadcast_to(np.asarray(reactance_ohm_km, dtype=float), ib.shape)
+
+    km = arrays["length"] / 1000
+    du = math.sqrt(3) * ib * km * (r * pf + x * math.sqrt(1 - pf**2))
+    loss_kw = 3 * ib**2 * r * km / 1000
+    cum_du, circuit_du = segmented_cumsum(du, counts)
+    cum_loss, circuit_loss = segmented_cumsum(loss_kw, counts)
+
+    to_pct = 100 / (system["voltage"] * 1000)
+    return {
+        "ib": ib,
+        "resistance": r,
+        "reactance": x,
+        "voltage_drop": du,
+        "voltage_drop_pct": du * to_pct,
+        "cumulative_drop": cum_du,
+        "cumulative_drop_pct": cum_du * to_pct,
+        "losses_kw": loss_kw,
+        "cumulative_losses_kw": cum_loss,
+        "circuit_drop_pct": circuit_du * to_pct,
+        "circuit_losses_kw": circuit_loss,
+    }
+
+def losses_project(circuits, system=None):
+    """
+    Voltage drop and losses of a project (circuits as in the app session).
+    A tramo may carry "reactance_ohm_km" to override the typical reactance.
+    Returns one dict per circuit:
+    {"drop_pct", "losses_kw", "tramos": [{"design_power", "ib", "voltage_drop",
+     "voltage_drop_pct", "cumulative_drop_pct", "losses_kw", "tables_hash"}, ...]}
+    """
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+
+    arrays, design_power, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return [{"drop_pct": 0.0, "losses_kw": 0.0, "tramos": []} for _ in circuits]
+    sections = [s for circuit in circuits for s in circuit["sections"]]
+    reactance_ohm_km = None
+    if any("reactance_ohm_km" in s for s in sections):
+        x_default = reactance(arrays["core_type"], arrays["layout"], system["frequency"])
+        reactance_ohm_km = [s.get("reactance_ohm_km", x) for s, x in zip(sections, x_default)]
+    return losses_project_arrays(arrays, design_power, counts, system, reactance_ohm_km)
+
+def losses_project_arrays(arrays, design_power, counts, system, reactance_ohm_km=None):
+    """losses_project() for tramo arrays grouped by circuit (counts tramos per circuit)."""
+    tables_hash = compiled_tables.TABLES.fingerprint
+    res = losses_tramos(arrays, design_power, counts, system, reactance_ohm_km)
+    res["design_power"] = design_power
+
+    fields = ["design_power", "ib", "voltage_drop", "voltage_drop_pct", "cumulative_drop_pct", "losses_kw"]
+    columns = [res[name].tolist() for name in fields]
+    records = [{**dict(zip(fields, row)), "tables_hash": tables_hash} for row in zip(*columns)]
+
+    return [
+        {
+            "drop_pct": float(res["circuit_drop_pct"][i]),
+            "losses_kw": float(res["circuit_losses_kw"][i]),
+            "tramos": tramos,
+        }
+        for i, tramos in enumerate(batch.split_by_counts(records, counts))
+    ]
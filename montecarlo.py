@@ -0,0 +1,138 @@
+# montecarlo.py
+# Probabilistic ampacity check: soil temperature and thermal resistivity are
+# sampled from user distributions and pushed through K1 (Table B.11) and K3
+# (Tables B.14 - B.17). Per tramo it reports the probability that Ib > Iz'
+# and percentiles of the margin Iz' - Ib.
+#
+# Only K1·K3 varies with the samples, and K3 only depends on the K3 table
+# and the section, so the product is sampled once per distinct
+# (table, section) curve and shared by every tramo on that curve. Since the
+# margin grows with K1·K3, its percentiles and the failure probability
+# follow from the sorted product of each curve.
+
+import math
+
+import numpy as np
+import batch
+import compiled_tables
+from engine import DEFAULT_SYSTEM
+from instrumentation import timed
+
+DEFAULT_PERCENTILES = (5, 50, 95)
+
+def sample(spec, n, rng):
+    """
+    Draw n samples from a distribution spec:
+      number                                     constant
+      {"dist": "normal", "mean", "std"}
+      {"dist": "lognormal", "mean", "std"}       mean/std of the variable itself
+      {"dist": "uniform", "low", "high"}
+      {"dist": "triangular", "low", "mode", "high"}
+      array-like                                 samples used as given
+    Raises ValueError on unknown distributions.
+    """
+    if isinstance(spec, (int, float)):
+        return np.full(n, float(spec))
+    if not isinstance(spec, dict):
+        return np.asarray(spec, dtype=float)
+    dist = spec.get("dist", "normal")
+    if dist == "normal":
+        return rng.normal(spec["mean"], spec["std"], n)
+    if dist == "lognormal":
+        sigma2 = math.log(1 + (spec["std"] / spec["mean"])**2)
+        return rng.lognormal(math.log(spec["mean"]) - sigma2/2, math.sqrt(sigma2), n)
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], n)
+    if dist == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], n)
+    raise ValueError(f"Distribución desconocida: {dist!r}")
+
+@timed("montecarlo.monte_carlo_tramos")
+def monte_carlo_tramos(arrays, design_power, temp_ground, resistivity_ground, system,
+                       n_samples=100_000, seed=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Monte Carlo check of every tramo.
+    temp_ground / resistivity_ground: distribution specs (see sample());
+    negative resistivity samples are clipped to 0. seed makes runs
+    reproducible. Returns dict of arrays:
+      ib, iz_prime_nominal (Iz' at the sample means),
+      failure_probability (per tramo), margin_percentiles and
+      iz_prime_percentiles (tramos x percentiles, A)
+    """
+    rng = np.random.default_rng(seed)
+    temps = sample(temp_ground, n_samples, rng)
+    resistivities = np.maximum(sample(resistivity_ground, n_samples, rng), 0.0)
+    k1 = batch.batch_k1(temps)
+    bracket = batch.k3_resistivity_bracket(resistivities)
+
+    # Deterministic part of Iz' per tramo
+    n = len(design_power)
+    res = batch.evaluate_tramos(arrays, design_power,
+                                {"temp_ground": float(np.mean(temps)),
+                                 "resistivity_ground": float(np.mean(resistivities))}, system)
+    fixed = np.broadcast_to(res["base_iz"] * res["k2"] * res["k4"], (n,))
+    ib = np.broadcast_to(res["ib"], (n,))
+
+    table = batch._table_index(arrays["install_type"], arrays["core_type"])
+    curves, curve_of = np.unique(np.stack([table, arrays["section_mm2"]], axis=1),
+                                 axis=0, return_inverse=True)
+    curve_of = curve_of.ravel()
+
+    q = np.asarray(percentiles, dtype=float) / 100
+    product_q = np.empty((len(curves), len(q)))
+    failure = np.empty(n)
+    for c, (t, section) in enumerate(curves):
+        install, core = int(t) % 2, int(t) // 2
+        product = np.sort(k1 * batch.k3_on_bracket(bracket, install, core, section))
+        product_q[c] = np.quantile(product, q)
+        members = np.flatnonzero(curve_of == c)
+        # Fails when fixed * K1·K3 < Ib
+        with np.errstate(divide="ignore", invalid="ignore"):
+            threshold = np.where(fixed[members] > 0, ib[members] / fixed[members], np.inf)
+        failure[members] = np.searchsorted(product, threshold, side="left") / len(product)
+
+    iz_q = fixed[:, None] * product_q[curve_of]
+    return {
+        "ib": ib,
+        "iz_prime_nominal": np.broadcast_to(res["iz_prime"], (n,)),
+        "failure_probability": failure,
+        "iz_prime_percentiles": iz_q,
+        "margin_percentiles": iz_q - ib[:, None],
+    }
+
+def monte_carlo_project(circuits, temp_ground, resistivity_ground, system=None,
+                        n_samples=100_000, seed=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Monte Carlo check of a project (circuits as in the app session).
+    Returns one list per circuit of records:
+    {"design_power", "ib", "failure_probability",
+     "margin_percentiles": {p: A}, "iz_prime_percentiles": {p: A}, "tables_hash"}
+    """
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    arrays, design_power, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return [[] for _ in circuits]
+    return monte_carlo_project_arrays(arrays, design_power, counts, temp_ground, resistivity_ground,
+                                      system, n_samples, seed, percentiles)
+
+def monte_carlo_project_arrays(arrays, design_power, counts, temp_ground, resistivity_ground, system,
+                               n_samples=100_000, seed=None, percentiles=DEFAULT_PERCENTILES):
+    """monte_carlo_project() for tramo arrays grouped by circuit (counts tramos per circuit)."""
+    tables_hash = compiled_tables.TABLES.fingerprint
+    mc = monte_carlo_tramos(arrays, design_power, temp_ground, resistivity_ground, system,
+                            n_samples, seed, percentiles)
+
+    margins = mc["margin_percentiles"].tolist()
+    iz = mc["iz_prime_percentiles"].tolist()
+    records = [
+        {
+            "design_power": float(design_power[i]),
+            "ib": float(mc["ib"][i]),
+            "failure_probability": float(mc["failure_probability"][i]),
+            "margin_percentiles": dict(zip(percentiles, margins[i])),
+            "iz_prime_percentiles": dict(zip(percentiles, iz[i])),
+            "tables_hash": tables_hash,
+        }
+        for i in range(len(design_power))
+    ]
+    return batch.split_by_counts(records, counts)
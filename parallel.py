@@ -0,0 +1,132 @@
+# parallel.py
+# Multi-process project evaluation. Cumulative power only flows within a
+# circuit, so circuits are independent: they are grouped into contiguous
+# chunks, evaluated in a process pool and merged back in input order.
+#
+# Workers run the vectorized pipeline (batch.project_arrays +
+# batch.evaluate_tramos) on their chunk and send back NumPy arrays, which
+# are cheap to transfer; per-tramo records are only built in the parent
+# when asked for (project_records). The pool is kept between calls and
+# only recreated when the worker count or the active table set changes.
+
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import batch
+import compiled_tables
+import engine
+
+RESULT_FIELDS = ["design_power", "ib", "k1", "k2", "k3", "k4", "base_iz", "iz_prime", "passed"]
+
+def _init_worker(tables):
+    # Workers must use the same table set as the parent. Forked workers get
+    # the parent's CompiledTables by inheritance (nothing is pickled);
+    # spawned ones get (raw, name, fingerprint), since they start with the
+    # built-in tables.
+    if isinstance(tables, compiled_tables.CompiledTables):
+        if compiled_tables.TABLES is not tables:
+            compiled_tables.use_tables(tables)
+        return
+    raw, name, fingerprint = tables
+    if compiled_tables.TABLES.fingerprint != fingerprint:
+        compiled_tables.use_tables(compiled_tables.CompiledTables(raw, name=name))
+
+def evaluate_circuits(circuits, site, system):
+    """
+    Vectorized evaluation of circuits: (dict of result arrays in tramo
+    order, tramos per circuit). Fields are RESULT_FIELDS.
+    """
+    arrays, design_power, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return {name: np.zeros(0, dtype=bool if name == "passed" else float) for name in RESULT_FIELDS}, counts
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+    n = len(design_power)
+    return {name: np.broadcast_to(res[name], (n,)).copy() for name in RESULT_FIELDS}, counts
+
+def _evaluate_chunk(args):
+    chunk, site, system = args
+    return evaluate_circuits(chunk, site, system)
+
+def chunk_circuits(circuits, n_chunks):
+    """
+    Split circuits into at most n_chunks contiguous groups of similar
+    tramo counts. Returns a list of lists of circuits.
+    """
+    total = sum(len(c["sections"]) for c in circuits)
+    target = max(1, math.ceil(total / max(1, n_chunks)))
+    chunks, current, size = [], [], 0
+    for circuit in circuits:
+        current.append(circuit)
+        size += len(circuit["sections"])
+        if size >= target:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Pool shared by every call: (key, executor)
+_pool = (None, None)
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool
+    tables = compiled_tables.TABLES
+    key = (workers, tables.fingerprint, os.getpid())
+    with _pool_lock:
+        old_key, pool = _pool
+        if old_key == key:
+            return pool
+        if pool is not None and old_key[2] == os.getpid():
+            # Work already submitted by other callers still completes
+            pool.shutdown(wait=False)
+        if "fork" in multiprocessing.get_all_start_methods():
+            context, initargs = multiprocessing.get_context("fork"), (tables,)
+        else:
+            context, initargs = None, ((tables.raw, tables.name, tables.fingerprint),)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=initargs)
+        _pool = (key, pool)
+        return pool
+
+def shutdown_pool():
+    """Stop the shared worker pool (it is recreated on the next call)."""
+    global _pool
+    with _pool_lock:
+        key, pool = _pool
+        _pool = (None, None)
+    if pool is not None and key[2] == os.getpid():
+        pool.shutdown()
+
+def evaluate_project_parallel(circuits, site=None, system=None, workers=None, chunks_per_worker=4):
+    """
+    Vectorized project evaluation over a process pool.
+    workers: pool size (None = all cores, 1 = in-process).
+    chunks_per_worker: load-balancing granularity.
+    Returns (result arrays in project tramo order, tramos per circuit);
+    the arrays are RESULT_FIELDS plus "tables_hash". project_records()
+    turns them into per-circuit records.
+    """
+    site = {**engine.DEFAULT_SITE, **(site or {})}
+    system = {**engine.DEFAULT_SYSTEM, **(system or {})}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(circuits) < 2:
+        res, counts = evaluate_circuits(circuits, site, system)
+    else:
+        chunks = chunk_circuits(circuits, workers * chunks_per_worker)
+        # map() yields in submission order, so the merge is deterministic
+        parts = list(_get_pool(workers).map(_evaluate_chunk, [(chunk, site, system) for chunk in chunks]))
+        res = {name: np.concatenate([part[name] for part, _ in parts]) for name in RESULT_FIELDS}
+        counts = [count for _, part_counts in parts for count in part_counts]
+    res["tables_hash"] = compiled_tables.TABLES.fingerprint
+    return res, counts
+
+def project_records(res, counts):
+    """Per-circuit lists of result records from evaluate_project_parallel() output."""
+    columns = [res[name].tolist() for name in RESULT_FIELDS]
+    records = [{**dict(zip(RESULT_FIELDS, row)), "tables_hash": res["tables_hash"]} for row in zip(*columns)]
+    return batch.split_by_counts(records, counts)
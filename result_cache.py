@@ -0,0 +1,252 @@
+# result_cache.py
+# Persistent, content-addressed cache of tramo factor evaluations (K1..K4,
+# base Iz, Iz'), shared across sessions, processes and batch runs.
+#
+# The key is the SHA-256 of the normalized factor inputs of a tramo
+# (engine.FACTOR_FIELDS), the site parameters and the fingerprint of the
+# active tables, so editing data_tables.py or switching table packs
+# invalidates every affected entry by construction. System parameters and
+# design power only enter Ib, which is recomputed on every run.
+#
+# Storage is a SQLite database in WAL mode (safe for concurrent readers and
+# writers in several processes), evicted least-recently-used down to a
+# size limit. The total stored size is kept in a metadata row by triggers,
+# so the limit check is a single-row read; access times of cache hits are
+# buffered in memory and written in batches.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import accumulate
+
+import compiled_tables
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM, FACTOR_FIELDS, evaluate_section_factors, verify_section
+
+CACHE_VERSION = 1  # bump when the cached record layout changes
+DEFAULT_PATH = os.environ.get(
+    "AMPACITY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ampacity", "results.sqlite")
+)
+DEFAULT_MAX_BYTES = 256 * 2**20
+EVICT_TO = 0.9  # fraction of max_bytes kept after an eviction
+ACCESS_FLUSH_ROWS = 1000  # buffered access times written after this many hits...
+ACCESS_FLUSH_SECONDS = 30.0  # ...or this long after the last write
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+    " size INTEGER NOT NULL, last_access REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)",
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    # Running total of results.size, seeded from existing rows on upgrade
+    "INSERT OR IGNORE INTO meta SELECT 'total_size', COALESCE(SUM(size), 0) FROM results",
+    "CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN"
+    " UPDATE meta SET value = value + new.size WHERE name = 'total_size'; END",
+    "CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN"
+    " UPDATE meta SET value = value - old.size WHERE name = 'total_size'; END",
+    "CREATE TRIGGER IF NOT EXISTS results_resize AFTER UPDATE OF size ON results BEGIN"
+    " UPDATE meta SET value = value + new.size - old.size WHERE name = 'total_size'; END",
+)
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value).strip()
+
+def factor_key(section, site, fingerprint=None):
+    """Content hash of everything a tramo's factors depend on."""
+    inputs = {name: _normalize(section.get(name)) for name in FACTOR_FIELDS}
+    # engine.evaluate_section_factors treats a missing layout as Trefoil
+    if inputs["layout"] is None:
+        inputs["layout"] = "Trefoil"
+    payload = {
+        "v": CACHE_VERSION,
+        "tables": fingerprint or compiled_tables.TABLES.fingerprint,
+        "site": {name: _normalize(site[name]) for name in ("temp_ground", "resistivity_ground")},
+        "tramo": inputs,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    On-disk key -> JSON record store with LRU eviction.
+    One instance per process; safe to use from several threads.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._accessed = {}  # key -> last access time not yet written
+        self._accessed_flush = time.time()
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+
+    def _connection(self):
+        # SQLite connections must not cross a fork: reopen in child processes
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._conn, self._pid = conn, os.getpid()
+            self._accessed = {}
+        return self._conn
+
+    def _flush_access(self, conn):
+        # Write buffered access times of cache hits in one transaction
+        self._accessed_flush = time.time()
+        if not self._accessed:
+            return
+        rows = [(t, key) for key, t in self._accessed.items()]
+        self._accessed = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE results SET last_access = ? WHERE key = ?", rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_many(self, keys):
+        """Cached records for keys: dict key -> record (missing keys left out)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = conn.execute(f"SELECT key, value FROM results WHERE key IN ({marks})", part).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            now = time.time()
+            self._accessed.update(dict.fromkeys(found, now))
+            if (len(self._accessed) >= ACCESS_FLUSH_ROWS
+                    or now - self._accessed_flush >= ACCESS_FLUSH_SECONDS):
+                self._flush_access(conn)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, records):
+        """Store records (dict key -> JSON-serializable record), then evict if over the limit."""
+        if not records:
+            return
+        now = time.time()
+        rows = []
+        for key, record in records.items():
+            value = json.dumps(record)
+            rows.append((key, value, len(key) + len(value), now))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Upsert rather than INSERT OR REPLACE so the size triggers fire
+                conn.executemany(
+                    "INSERT INTO results VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+                    " value = excluded.value, size = excluded.size, last_access = excluded.last_access",
+                    rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._evict(conn)
+
+    def _total_size(self, conn):
+        return conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+
+    def _evict(self, conn):
+        if self._total_size(conn) <= self.max_bytes:
+            return
+        # Recent hits must be on disk before choosing the least recently used
+        self._flush_access(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            target = self._total_size(conn) - self.max_bytes * EVICT_TO
+            freed, victims = 0, []
+            for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access"):
+                victims.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            conn.executemany("DELETE FROM results WHERE key = ?", victims)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.evictions += len(victims)
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            size = self._total_size(conn)
+        return {"entries": entries, "bytes": size, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self):
+        with self._lock:
+            self._accessed = {}
+            self._connection().execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._flush_access(self._conn)
+                self._conn.close()
+            self._conn = None
+
+    # Factor store interface used by engine.IncrementalEvaluator
+
+    def get_factors(self, sections, site):
+        """Cached factor records for tramos (None where not cached)."""
+        keys = [factor_key(s, site) for s in sections]
+        found = self.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def put_factors(self, sections, site, factors):
+        self.put_many({factor_key(s, site): f for s, f in zip(sections, factors)})
+
+def evaluate_project_cached(circuits, site=None, system=None, cache=None):
+    """
+    engine.evaluate_project() backed by the persistent cache: only tramos
+    whose factor inputs are not cached are computed.
+    Returns (results, {"computed", "cached"}).
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    cache = cache or ResultCache()
+
+    sections = [s for circuit in circuits for s in circuit["sections"]]
+    factors = cache.get_factors(sections, site)
+    missing = [i for i, f in enumerate(factors) if f is None]
+    computed = {}
+    for i in missing:
+        factors[i] = evaluate_section_factors(sections[i], site)
+        computed[factor_key(sections[i], site)] = factors[i]
+    cache.put_many(computed)
+
+    results, n = [], 0
+    for circuit in circuits:
+        records = []
+        for power in accumulate(s["pb_power"] for s in circuit["sections"]):
+            records.append(verify_section(factors[n], power, system))
+            n += 1
+        results.append(records)
+    return results, {"computed": len(missing), "cached": len(sections) - len(missing)}
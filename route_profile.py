@@ -0,0 +1,241 @@
+# route_profile.py
+# Route-profile evaluation: a tramo is split into sub-segments along its
+# route, each with its own laying conditions (depth, soil temperature and
+# resistivity, install type, grouping). Every sub-segment is evaluated and
+# the tramo is limited by the segment with the lowest Iz'.
+#
+# Profiles are streamed in chunks and reduced on the fly, so their size is
+# not limited by memory. Supported inputs:
+#   CSV          one row per segment
+#   GeoJSON      FeatureCollection of LineString features (.geojson, .json)
+#   GeoJSONSeq   one feature per line (.geojsons, .geojsonl)
+# Segment columns / feature properties (all optional, missing ones take the
+# tramo or site values): depth, temp_ground, resistivity_ground,
+# install_type, parallel_circuits, spacing, length (m). GeoJSON segments
+# without "length" are measured along their coordinates (WGS84).
+#
+# Usage:
+#   python route_profile.py perfil.csv --design-power 20000 --tramo '{"section_mm2": 240}'
+
+import argparse
+import json
+
+import numpy as np
+import batch
+import compiled_tables
+from batch_cli import add_site_system_arguments, read_csv_chunks, site_system
+from engine import DEFAULT_SECTION, DEFAULT_SITE, DEFAULT_SYSTEM
+
+SEGMENT_FIELDS = ["depth", "install_type", "parallel_circuits", "spacing"]
+SITE_FIELDS = ["temp_ground", "resistivity_ground"]
+EARTH_RADIUS = 6_371_008.8  # m
+
+# --- Readers ---
+
+def _iter_features(f, block=1 << 16):
+    """Yield the features of a GeoJSON FeatureCollection without reading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, eof = "", False
+
+    def more():
+        nonlocal buf, eof
+        chunk = f.read(block)
+        eof = not chunk
+        buf += chunk
+
+    while True:
+        start = buf.find('"features"')
+        if start >= 0:
+            bracket = buf.find("[", start)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+        if eof:
+            raise ValueError("El GeoJSON no contiene 'features'.")
+        more()
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("GeoJSON incompleto.")
+            buf, pos = "", 0
+            more()
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            feature, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("GeoJSON no válido.")
+            buf, pos = buf[pos:], 0
+            more()
+            continue
+        yield feature
+        pos = end
+        if pos > block:
+            buf, pos = buf[pos:], 0
+
+def _iter_feature_lines(f):
+    for line in f:
+        line = line.strip().lstrip("\x1e")  # RFC 8142 record separator
+        if line:
+            yield json.loads(line)
+
+def line_lengths(geometries):
+    """
+    Lengths (m) of WGS84 LineStrings or MultiLineStrings (None gives 0),
+    by haversine over the points of all geometries in one vectorized pass.
+    """
+    points, line_sizes, feature_of_line = [], [], []
+    for i, geometry in enumerate(geometries):
+        if geometry is None:
+            continue
+        lines = geometry["coordinates"]
+        if geometry["type"] == "LineString":
+            lines = [lines]
+        for coords in lines:
+            points.extend(coords)
+            line_sizes.append(len(coords))
+            feature_of_line.append(i)
+    if not points:
+        return np.zeros(len(geometries))
+    try:
+        xy = np.asarray(points, dtype=float)[:, :2]
+    except ValueError:
+        # Mixed 2D / 3D positions
+        xy = np.asarray([p[:2] for p in points], dtype=float)
+    lon, lat = np.radians(xy).T
+    line = np.repeat(np.arange(len(line_sizes)), line_sizes)
+    # Consecutive points of the same line form a segment
+    same = line[1:] == line[:-1]
+    a = (np.sin(np.diff(lat) / 2)**2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2)**2)
+    d = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a[same]))
+    owner = np.asarray(feature_of_line)[line[:-1][same]]
+    return np.bincount(owner, weights=d, minlength=len(geometries))
+
+def line_length(geometry):
+    """Length (m) of a WGS84 LineString or MultiLineString (haversine)."""
+    return float(line_lengths([geometry])[0])
+
+def read_geojson_chunks(path, chunk_size):
+    """Yield dicts column -> list of values from GeoJSON features, chunk_size at a time."""
+    with open(path, encoding="utf-8") as f:
+        lines = path.lower().endswith((".geojsons", ".geojsonl"))
+        features = _iter_feature_lines(f) if lines else _iter_features(f)
+        rows, geometries = [], []
+        for feature in features:
+            row = dict(feature.get("properties") or {})
+            rows.append(row)
+            # Lengths are measured for the whole chunk at once
+            geometries.append(None if "length" in row else feature.get("geometry"))
+            if len(rows) == chunk_size:
+                yield _columns(rows, geometries)
+                rows, geometries = [], []
+        if rows:
+            yield _columns(rows, geometries)
+
+def _columns(rows, geometries):
+    lengths = line_lengths(geometries)
+    for row, length in zip(rows, lengths.tolist()):
+        row.setdefault("length", length)
+    names = {name for row in rows for name in row}
+    return {name: [row.get(name) for row in rows] for name in names}
+
+def read_profile_chunks(path, chunk_size=100_000):
+    if path.lower().endswith((".geojson", ".json", ".geojsons", ".geojsonl")):
+        return read_geojson_chunks(path, chunk_size)
+    return read_csv_chunks(path, chunk_size)
+
+# --- Evaluation ---
+
+def _fill(values, default):
+    """Replace missing (None / empty) entries with default."""
+    return [default if v is None or v == "" else v for v in values]
+
+def evaluate_profile(tramo, chunks, design_power, site=None, system=None):
+    """
+    Evaluate a tramo along a streamed route profile.
+    tramo: tramo dict (fields not given per segment); chunks: iterable of
+    segment column dicts (see read_profile_chunks); design_power: kVA.
+    Returns {"segments", "length", "ib", "min_iz_prime", "passed",
+    "limiting_segment" (index), "limiting_chainage" (m from the route start),
+    "limiting": {segment conditions and k1..k4, base_iz}, "tables_hash"}.
+    Raises ValueError on an empty profile or invalid segment values.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    tramo = {**DEFAULT_SECTION, **tramo}
+    ib = float(batch.batch_ib(design_power, system["voltage"], system["pf"], system["oversizing"]))
+    tables_hash = compiled_tables.TABLES.fingerprint
+
+    best = None
+    offset, chainage = 0, 0.0
+    for chunk in chunks:
+        n = len(next(iter(chunk.values())))
+        columns = {name: [tramo[name]] * n for name in DEFAULT_SECTION}
+        for name in SEGMENT_FIELDS:
+            if name in chunk:
+                columns[name] = _fill(chunk[name], tramo[name])
+        conditions = {
+            name: np.asarray(_fill(chunk[name], site[name]), dtype=float) if name in chunk
+            else np.full(n, float(site[name]))
+            for name in SITE_FIELDS
+        }
+        lengths = np.asarray(_fill(chunk.get("length", [0.0] * n), 0.0), dtype=float)
+
+        arrays = batch.tramo_arrays(columns)
+        res = batch.evaluate_tramos(arrays, np.full(n, float(design_power)), conditions, system)
+        iz = np.broadcast_to(res["iz_prime"], (n,))
+        i = int(np.argmin(iz))
+        if best is None or iz[i] < best["min_iz_prime"]:
+            best = {
+                "min_iz_prime": float(iz[i]),
+                "limiting_segment": offset + i,
+                "limiting_chainage": chainage + float(np.sum(lengths[:i])),
+                "limiting": {
+                    "depth": float(arrays["depth"][i]),
+                    "install_type": batch.INSTALL_TYPES[arrays["install_type"][i]],
+                    "parallel_circuits": float(arrays["parallel_circuits"][i]),
+                    "spacing": float(arrays["spacing"][i]),
+                    "temp_ground": float(conditions["temp_ground"][i]),
+                    "resistivity_ground": float(conditions["resistivity_ground"][i]),
+                    **{k: float(np.broadcast_to(res[k], (n,))[i]) for k in ("k1", "k2", "k3", "k4", "base_iz")},
+                },
+            }
+        offset += n
+        chainage += float(np.sum(lengths))
+
+    if best is None:
+        raise ValueError("El perfil de trazado está vacío.")
+    return {
+        "segments": offset,
+        "length": chainage,
+        "ib": ib,
+        "passed": ib <= best["min_iz_prime"],
+        **best,
+        "tables_hash": tables_hash,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluación de un tramo a lo largo de su perfil de trazado.")
+    parser.add_argument("profile", help="Perfil: CSV, GeoJSON o GeoJSONSeq")
+    parser.add_argument("--design-power", type=float, required=True, help="Potencia de diseño del tramo (kVA)")
+    parser.add_argument("--tramo", default="{}", help="Campos del tramo en JSON (sección, conductor, ...)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    add_site_system_arguments(parser)
+    args = parser.parse_args(argv)
+
+    site, system = site_system(args)
+    try:
+        result = evaluate_profile(json.loads(args.tramo), read_profile_chunks(args.profile, args.chunk_size),
+                                  args.design_power, site, system)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+# service.py
+# Local HTTP calculation service (asyncio, standard library + NumPy).
+# Concurrent requests are coalesced into one vectorized evaluation per
+# (site, system) pair; factor lookups use the shared precompiled tables.
+#
+# Usage:
+#   python service.py serve --port 8502
+#   python service.py bench --port 8502 --concurrency 32 --requests 2000 --tramos 50
+#
+# Endpoints:
+#   GET  /health    -> {"status": "ok"}
+#   GET  /tables    -> active table set name and hash
+#   POST /evaluate  -> body {"site": {...}, "system": {...},
+#                            "circuits": [{"sections": [tramo, ...]}, ...]}
+#                      or   {"site": ..., "system": ..., "tramos": [tramo, ...]}
+#                      Flat tramos use "design_power" if given, else pb_power.
+#                      Missing tramo fields take the app defaults; numeric
+#                      inputs must be finite numbers.
+#                      Response {"tables_hash": ..., "results": [...]} with one
+#                      list per circuit, or one flat list for "tramos".
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from itertools import accumulate
+import sys
+import time
+
+import numpy as np
+import batch
+import compiled_tables
+from engine import DEFAULT_SECTION, DEFAULT_SITE, DEFAULT_SYSTEM
+
+RESULT_FIELDS = ["design_power", "ib", "k1", "k2", "k3", "k4", "base_iz", "iz_prime", "passed"]
+
+MAX_BODY_BYTES = 64 * 2**20
+READ_TIMEOUT = 30.0  # seconds a client may take to send a request
+
+# --- Request coalescing ---
+
+class Coalescer:
+    """
+    Collects evaluation jobs for up to max_delay seconds (or max_tramos
+    tramos) and runs them as one vectorized batch per (site, system).
+    The batch runs in a worker thread so the event loop keeps serving.
+    """
+
+    def __init__(self, max_delay=0.002, max_tramos=200_000):
+        self.max_delay = max_delay
+        self.max_tramos = max_tramos
+        self._pending = []
+        self._pending_tramos = 0
+        self._flush_handle = None
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, arrays, design_power, site, system):
+        """Queue a job; returns a future with its dict of result arrays."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((arrays, design_power, site, system, future))
+        self._pending_tramos += len(design_power)
+        if self._pending_tramos >= self.max_tramos:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        jobs, self._pending, self._pending_tramos = self._pending, [], 0
+        if not jobs:
+            return
+        try:
+            groups = {}
+            for job in jobs:
+                key = (tuple(sorted(job[2].items())), tuple(sorted(job[3].items())))
+                groups.setdefault(key, []).append(job)
+            loop = asyncio.get_running_loop()
+            for group in groups.values():
+                self.batches += 1
+                self.jobs += len(group)
+                task = loop.run_in_executor(None, _evaluate_group, group)
+                task.add_done_callback(lambda t, group=group: _deliver(group, t))
+        except Exception as e:
+            # The jobs are already off the queue: every waiting request must get an answer
+            for job in jobs:
+                if not job[4].done():
+                    job[4].set_exception(e)
+
+def _evaluate_group(group):
+    arrays = {key: np.concatenate([job[0][key] for job in group]) for key in group[0][0]}
+    design_power = np.concatenate([job[1] for job in group])
+    site, system = group[0][2], group[0][3]
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+    n = len(design_power)
+    res = {name: np.broadcast_to(res[name], (n,)) for name in RESULT_FIELDS}
+    parts, start = [], 0
+    for job in group:
+        end = start + len(job[1])
+        parts.append({name: values[start:end] for name, values in res.items()})
+        start = end
+    return parts
+
+def _deliver(group, task):
+    error = task.exception()
+    for i, job in enumerate(group):
+        future = job[4]
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(task.result()[i])
+
+# --- Request parsing ---
+
+def _tramo_jobs(payload):
+    """
+    Turn a request body into (arrays, design_power, circuit sizes or None).
+    Raises ValueError on malformed input.
+    """
+    if "circuits" in payload:
+        circuits = payload["circuits"]
+        if not isinstance(circuits, list) or not all(isinstance(c, dict) for c in circuits):
+            raise ValueError("'circuits' debe ser una lista de objetos JSON.")
+        groups = [_tramo_list(c.get("sections"), f"'sections' del circuito {i+1}") for i, c in enumerate(circuits)]
+        tramos = [t for group in groups for t in group]
+        counts = [len(group) for group in groups]
+        if not tramos:
+            return None, np.zeros(0), counts
+        # Same defaults as flat tramos; power accumulates along each circuit
+        arrays = batch.sections_to_arrays(tramos)
+        design_power = np.array([p for part in batch.split_by_counts(arrays["pb_power"].tolist(), counts)
+                                 for p in accumulate(part)], dtype=float)
+        return arrays, design_power, counts
+    if "tramos" not in payload:
+        raise ValueError("Se esperaba 'circuits' o 'tramos'.")
+    tramos = _tramo_list(payload["tramos"], "'tramos'")
+    if not tramos:
+        return None, np.zeros(0), None
+    arrays = batch.sections_to_arrays(tramos)
+    design_power = [t.get("design_power", t.get("pb_power", DEFAULT_SECTION["pb_power"])) for t in tramos]
+    for i, value in enumerate(design_power):
+        if not _finite(value):
+            raise ValueError(f"Tramo {i+1}: 'design_power' debe ser un número finito ({value!r}).")
+    return arrays, np.array(design_power, dtype=float), None
+
+def _tramo_list(tramos, name):
+    if not isinstance(tramos, list) or not all(isinstance(t, dict) for t in tramos):
+        raise ValueError(f"{name} debe ser una lista de tramos (objetos JSON).")
+    return tramos
+
+def _finite(value):
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+def _records(res):
+    columns = [res[name].tolist() for name in RESULT_FIELDS]
+    return [dict(zip(RESULT_FIELDS, row)) for row in zip(*columns)]
+
+def _parameters(payload, name):
+    """Site or system parameters of a request as floats (hashable for coalescing)."""
+    values = payload.get(name, {})
+    if not isinstance(values, dict):
+        raise ValueError(f"'{name}' debe ser un objeto JSON.")
+    if not all(_finite(value) for value in values.values()):
+        raise ValueError(f"Los valores de '{name}' deben ser números finitos.")
+    return {key: float(value) for key, value in values.items()}
+
+class CalculationService:
+    def __init__(self, coalescer=None):
+        self.coalescer = coalescer or Coalescer()
+
+    async def evaluate(self, payload):
+        if not isinstance(payload, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON.")
+        site = {**DEFAULT_SITE, **_parameters(payload, "site")}
+        system = {**DEFAULT_SYSTEM, **_parameters(payload, "system")}
+        arrays, design_power, counts = _tramo_jobs(payload)
+        if arrays is None:
+            records = []
+        else:
+            records = _records(await self.coalescer.submit(arrays, design_power, site, system))
+        if counts is not None:
+            records = batch.split_by_counts(records, counts)
+        return {"tables_hash": compiled_tables.TABLES.fingerprint, "results": records}
+
+    async def handle(self, method, path, body):
+        """Returns (status, response dict)."""
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "batches": self.coalescer.batches, "jobs": self.coalescer.jobs}
+        if path == "/tables" and method == "GET":
+            return 200, {"name": compiled_tables.TABLES.name, "hash": compiled_tables.TABLES.fingerprint}
+        if path == "/evaluate":
+            if method != "POST":
+                return 405, {"error": "Usar POST"}
+            try:
+                payload = json.loads(body or b"{}")
+                return 200, await self.evaluate(payload)
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": str(e)}
+            except Exception as e:
+                return 500, {"error": f"Error interno: {e}"}
+        return 404, {"error": "Ruta no encontrada"}
+
+    async def client_connected(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body cannot be framed: answer and close the connection
+                    status, response = 400, {"error": "Cabecera Content-Length no válida"}
+                    body = None
+                elif length > MAX_BODY_BYTES:
+                    status, response = 413, {"error": "Petición demasiado grande"}
+                    body = None
+                else:
+                    try:
+                        body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+                    except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                        break
+                    status, response = await self.handle(method, path.split("?", 1)[0], body)
+
+                try:
+                    data = json.dumps(response, allow_nan=False).encode("utf-8")
+                except ValueError:
+                    # e.g. design power overflowing to infinity: not representable in JSON
+                    status = 400
+                    data = json.dumps({"error": "El resultado no es finito; revise los valores de entrada."}).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive or body is None:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+async def serve(host="127.0.0.1", port=8502, max_delay=0.002):
+    service = CalculationService(Coalescer(max_delay=max_delay))
+    server = await asyncio.start_server(service.client_connected, host, port, limit=2**20)
+    print(f"Servicio de cálculo en http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+# --- Load-test client ---
+
+async def _post(reader, writer, host, body):
+    writer.write(
+        f"POST /evaluate HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    for line in head.decode("latin-1").split("\r\n"):
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    status = int(head.split(b" ", 2)[1])
+    await reader.readexactly(length)
+    return status
+
+async def run_load_test(host="127.0.0.1", port=8502, concurrency=32, requests=2000, tramos=50, seed=0):
+    """
+    Send `requests` POST /evaluate calls of `tramos` tramos each over
+    `concurrency` keep-alive connections. Returns a summary dict.
+    """
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(min(requests, 64)):
+        sections = [
+            {**DEFAULT_SECTION, "pb_power": rng.uniform(500.0, 5000.0),
+             "depth": rng.uniform(0.5, 3.0), "parallel_circuits": rng.randint(1, 12)}
+            for _ in range(tramos)
+        ]
+        bodies.append(json.dumps({"circuits": [{"sections": sections}]}).encode("utf-8"))
+
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                t0 = time.perf_counter()
+                status = await _post(reader, writer, host, bodies[i % len(bodies)])
+                latencies.append(time.perf_counter() - t0)
+                if status != 200:
+                    errors += 1
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "tramos_per_s": len(latencies) * tramos / elapsed,
+        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de cálculo de ampacidad.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="Arrancar el servicio")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8502)
+    p_serve.add_argument("--max-delay-ms", type=float, default=2.0, help="Espera máxima para agrupar peticiones")
+    p_serve.add_argument("--table-pack", help="Paquete de tablas alternativo (ver table_pack.py)")
+    p_bench = sub.add_parser("bench", help="Prueba de carga contra un servicio en marcha")
+    p_bench.add_argument("--host", default="127.0.0.1")
+    p_bench.add_argument("--port", type=int, default=8502)
+    p_bench.add_argument("--concurrency", type=int, default=32)
+    p_bench.add_argument("--requests", type=int, default=2000)
+    p_bench.add_argument("--tramos", type=int, default=50, help="Tramos por petición")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.table_pack:
+            from table_pack import use_pack
+            use_pack(args.table_pack)
+        try:
+            asyncio.run(serve(args.host, args.port, args.max_delay_ms / 1e3))
+        except KeyboardInterrupt:
+            pass
+    else:
+        summary = asyncio.run(run_load_test(args.host, args.port, args.concurrency,
+                                            args.requests, args.tramos))
+        print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
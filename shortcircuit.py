@@ -0,0 +1,89 @@
+# shortcircuit.py
+# Adiabatic short-circuit thermal withstand (IEC 60949): a conductor of
+# section S carries I = K·S/√t for t seconds, heating from its maximum
+# operating temperature (MAX_TEMPERATURES) to its short-circuit limit
+# (SHORT_CIRCUIT_TEMPERATURES). All tramos x fault durations in one array.
+
+import math
+
+import numpy as np
+import batch
+from instrumentation import timed
+from data_tables import ADIABATIC_CONSTANTS, MAX_TEMPERATURES, SHORT_CIRCUIT_TEMPERATURES
+
+DEFAULT_DURATIONS = [0.1, 0.5, 1.0]  # s
+DEFAULT_FAULT_KA = 20.0
+
+def adiabatic_k(conductor, insulation):
+    """IEC 60949 constant K (A·√s/mm²) for a conductor material and insulation name."""
+    c = ADIABATIC_CONSTANTS[conductor]
+    theta_i = MAX_TEMPERATURES[insulation]
+    theta_f = SHORT_CIRCUIT_TEMPERATURES[insulation]
+    return math.sqrt(
+        c["heat_capacity"] * (c["beta"] + 20) / c["resistivity_20"]
+        * math.log((c["beta"] + theta_f) / (c["beta"] + theta_i))
+    ) * 1e-6
+
+# [conductor, insulation] in the category orders of batch.py
+K_ARRAY = np.array([[adiabatic_k(c, i) for i in batch.INSULATIONS] for c in batch.CONDUCTORS])
+
+@timed("shortcircuit.check_short_circuit")
+def check_short_circuit(arrays, fault_ka, durations=DEFAULT_DURATIONS):
+    """
+    Withstand check of every tramo for every fault duration.
+    arrays: tramo arrays (batch.tramo_arrays); fault_ka: prospective fault
+    current (kA), scalar or per tramo; durations: clearing times (s).
+    Returns dict of arrays:
+      withstand_ka (tramos x durations), passed (tramos x durations),
+      max_duration (s, longest fault the tramo withstands), sc_passed
+      (all durations pass)
+    """
+    k = K_ARRAY[arrays["conductor"], arrays["insulation"]]
+    ks = k * arrays["section_mm2"]  # A·√s
+    t = np.asarray(durations, dtype=float)
+    withstand_ka = ks[:, None] / np.sqrt(t)[None, :] / 1000
+    fault = np.broadcast_to(np.asarray(fault_ka, dtype=float), ks.shape)
+    passed = withstand_ka >= fault[:, None]
+    with np.errstate(divide="ignore"):
+        max_duration = (ks / (fault * 1000))**2
+    return {
+        "withstand_ka": withstand_ka,
+        "passed": passed,
+        "max_duration": max_duration,
+        "sc_passed": passed.all(axis=1),
+    }
+
+def merge_short_circuit(circuits, project_results, fault_ka=DEFAULT_FAULT_KA, durations=DEFAULT_DURATIONS):
+    """
+    Add the short-circuit check to evaluated project records (as returned
+    by engine.evaluate_project). A tramo may carry "fault_current_ka" to
+    override fault_ka. Returns new records with:
+      "fault_ka", "sc_durations", "sc_withstand_ka" (list per duration),
+      "sc_passed_by_duration", "sc_max_duration", "sc_passed"
+    """
+    sections = [s for circuit in circuits for s in circuit["sections"]]
+    if not sections:
+        return [[dict(res) for res in results] for results in project_results]
+    arrays = batch.sections_to_arrays(sections)
+    fault = np.array([s.get("fault_current_ka", fault_ka) for s in sections], dtype=float)
+    sc = check_short_circuit(arrays, fault, durations)
+
+    withstand = sc["withstand_ka"].tolist()
+    passed = sc["passed"].tolist()
+    max_duration = sc["max_duration"].tolist()
+    merged, n = [], 0
+    for results in project_results:
+        records = []
+        for res in results:
+            records.append({
+                **res,
+                "fault_ka": float(fault[n]),
+                "sc_durations": list(durations),
+                "sc_withstand_ka": withstand[n],
+                "sc_passed_by_duration": passed[n],
+                "sc_max_duration": max_duration[n],
+                "sc_passed": all(passed[n]),
+            })
+            n += 1
+        merged.append(records)
+    return merged
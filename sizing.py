@@ -0,0 +1,105 @@
+# sizing.py
+# Minimum-section sizing: for each tramo, the smallest section of the active
+# table set (VALID_SECTIONS for the built-in tables) whose corrected
+# ampacity Iz' covers Ib.
+
+import numpy as np
+import batch
+import compiled_tables
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM
+from instrumentation import timed
+
+SECTIONS = np.array(compiled_tables.TABLES.sections, dtype=float)
+
+def _load_tables(tables):
+    global SECTIONS
+    SECTIONS = np.array(tables.sections, dtype=float)
+
+compiled_tables.on_tables_changed(_load_tables)
+
+@timed("sizing.minimum_sections")
+def minimum_sections(arrays, design_power, site, system, conductor=None):
+    """
+    Vectorized binary search over SECTIONS (Iz' grows with section).
+    arrays: tramo arrays (batch.tramo_arrays); conductor: optional code from
+    batch.CONDUCTORS overriding the tramo conductor.
+    Returns dict of arrays: section_mm2 (NaN where no section suffices),
+    iz_prime at that section, ib.
+    """
+    n = len(design_power)
+    if conductor is not None:
+        arrays = {**arrays, "conductor": np.full(n, conductor)}
+
+    last = len(SECTIONS) - 1
+    # Search the first passing index in [lo, hi); hi == len(SECTIONS) means none
+    lo = np.zeros(n, dtype=np.int64)
+    hi = np.full(n, len(SECTIONS), dtype=np.int64)
+    while True:
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo + hi) // 2
+        res = batch.evaluate_tramos(arrays, design_power, site, system,
+                                    section=SECTIONS[np.minimum(mid, last)])
+        ok = res["passed"] & (res["base_iz"] > 0)
+        hi = np.where(active & ok, mid, hi)
+        lo = np.where(active & ~ok, mid + 1, lo)
+
+    found = lo <= last
+    chosen = SECTIONS[np.minimum(lo, last)]
+    res = batch.evaluate_tramos(arrays, design_power, site, system, section=chosen)
+    return {
+        "section_mm2": np.where(found, chosen, np.nan),
+        "iz_prime": np.where(found, res["iz_prime"], np.nan),
+        "ib": res["ib"],
+    }
+
+def size_project(circuits, site=None, system=None, conductors=None):
+    """
+    Minimum section for every tramo of a project.
+    conductors: optional list of materials ("Al", "Cu") to size for; by
+    default each tramo keeps its own conductor.
+    Returns one list per circuit of records:
+    {"design_power", "ib", "sizing": {conductor: {"section_mm2", "iz_prime"}},
+     "tables_hash"}
+    with section_mm2 None when no valid section is enough.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+
+    arrays, design_power, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return [[] for _ in circuits]
+    return size_project_arrays(arrays, design_power, counts, site, system, conductors)
+
+def size_project_arrays(arrays, design_power, counts, site, system, conductors=None):
+    """size_project() for tramo arrays grouped by circuit (counts tramos per circuit)."""
+    tables_hash = compiled_tables.TABLES.fingerprint
+    if conductors is None:
+        runs = {None: minimum_sections(arrays, design_power, site, system)}
+        names = [batch.CONDUCTORS[c] for c in arrays["conductor"]]
+    else:
+        runs = {
+            name: minimum_sections(arrays, design_power, site, system,
+                                   conductor=batch.CONDUCTORS.index(name))
+            for name in conductors
+        }
+        names = None
+
+    records = []
+    for i in range(len(design_power)):
+        sizing = {}
+        for name, run in runs.items():
+            section = run["section_mm2"][i]
+            sizing[names[i] if name is None else name] = {
+                "section_mm2": None if np.isnan(section) else int(section),
+                "iz_prime": None if np.isnan(section) else float(run["iz_prime"][i]),
+            }
+        records.append({
+            "design_power": float(design_power[i]),
+            "ib": float(next(iter(runs.values()))["ib"][i]),
+            "sizing": sizing,
+            "tables_hash": tables_hash,
+        })
+
+    return batch.split_by_counts(records, counts)
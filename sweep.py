@@ -0,0 +1,162 @@
+# sweep.py
+# Parametric environmental sweep: K1·K2·K3 derating over ground temperature
+# (Table B.11), burial depth (B.12/B.13) and soil resistivity (B.14 - B.17)
+# for every installation / core type / section, stored as a reusable grid.
+# A grid records the hash of the table set it was computed with and is only
+# loaded while that same table set is active.
+#
+# Usage:
+#   python sweep.py derating_grid.npz --workers 8
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import batch
+import compiled_tables
+import parallel
+
+# Default axes: the ranges covered by the IEC tables
+DEFAULT_TEMPERATURES = np.arange(10.0, 60.0 + 1e-9, 1.0)
+DEFAULT_RESISTIVITIES = np.round(np.arange(0.7, 3.0 + 1e-9, 0.05), 2)
+DEFAULT_DEPTHS = np.round(np.arange(0.5, 3.0 + 1e-9, 0.05), 2)
+
+def _grid_chunk(args):
+    """
+    Derating K1·K2·K3 for a slab of temperatures.
+    Returns an array (install, core, section, temperature, resistivity, depth).
+    """
+    temps, resistivities, depths, sections = args
+    install = np.arange(len(batch.INSTALL_TYPES))[:, None, None, None, None, None]
+    core = np.arange(len(batch.CORE_TYPES))[None, :, None, None, None, None]
+    section = np.asarray(sections, dtype=float)[None, None, :, None, None, None]
+    t = np.asarray(temps, dtype=float)[None, None, None, :, None, None]
+    r = np.asarray(resistivities, dtype=float)[None, None, None, None, :, None]
+    d = np.asarray(depths, dtype=float)[None, None, None, None, None, :]
+
+    # Each factor only varies along its own axes; broadcasting builds the product
+    k1 = batch.batch_k1(t)
+    k2 = batch.batch_k2(d, section, install)
+    k3 = batch.batch_k3(r, install, core, section)
+    return k1 * k2 * k3
+
+class DeratingGrid:
+    """
+    Dense K1·K2·K3 grid indexed by
+    (install code, core code, section index, temperature, resistivity, depth).
+    """
+
+    def __init__(self, temperatures, resistivities, depths, values, sections, tables_hash):
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.resistivities = np.asarray(resistivities, dtype=float)
+        self.depths = np.asarray(depths, dtype=float)
+        self.values = values
+        self.sections = np.asarray(sections, dtype=float)
+        self.tables_hash = str(tables_hash)
+
+    def save(self, path):
+        np.savez_compressed(
+            path, temperatures=self.temperatures, resistivities=self.resistivities,
+            depths=self.depths, sections=self.sections, values=self.values,
+            tables_hash=np.array(self.tables_hash)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved grid; raises ValueError unless it matches the active table set."""
+        active = compiled_tables.TABLES.fingerprint
+        with np.load(path) as data:
+            if "tables_hash" not in data:
+                raise ValueError(f"La rejilla {path} no indica con qué tablas se generó; vuelva a generarla.")
+            tables_hash = str(data["tables_hash"])
+            if tables_hash != active:
+                raise ValueError(f"La rejilla {path} se generó con otras tablas ({tables_hash[:12]}, "
+                                 f"activas {active[:12]}); vuelva a generarla.")
+            return cls(data["temperatures"], data["resistivities"], data["depths"], data["values"],
+                       data["sections"], tables_hash)
+
+    @staticmethod
+    def _nearest(axis, x):
+        i = np.clip(np.searchsorted(axis, x), 1, len(axis) - 1)
+        return np.where(np.abs(x - axis[i - 1]) <= np.abs(axis[i] - x), i - 1, i)
+
+    def _section_index(self, section):
+        """Positions of section values in self.sections; ValueError if any is not there."""
+        section = np.asarray(section, dtype=float)
+        s = np.clip(np.searchsorted(self.sections, section), 0, len(self.sections) - 1)
+        unknown = self.sections[s] != section
+        if np.any(unknown):
+            raise ValueError(f"Sección no incluida en la rejilla: {np.atleast_1d(section[unknown])[0]:g} mm²")
+        return s
+
+    def factor(self, install, core, section, temperature, resistivity, depth):
+        """
+        K1·K2·K3 at the nearest grid point (vectorized, broadcasting).
+        install / core are batch codes; section must be in self.sections
+        (ValueError otherwise).
+        """
+        s = self._section_index(section)
+        return self.values[
+            install, core, s,
+            self._nearest(self.temperatures, np.asarray(temperature, dtype=float)),
+            self._nearest(self.resistivities, np.asarray(resistivity, dtype=float)),
+            self._nearest(self.depths, np.asarray(depth, dtype=float)),
+        ]
+
+    def tramo_iz_prime(self, arrays):
+        """
+        Iz' of every tramo over the whole temperature x resistivity x depth
+        grid: array (tramo, temperature, resistivity, depth). K4 and base Iz
+        come from the tramo arrays (batch.tramo_arrays).
+        """
+        base_iz = batch.batch_base_iz(
+            arrays["insulation"], arrays["conductor"], arrays["core_type"],
+            arrays["install_type"], arrays["armour"], arrays["layout"], arrays["section_mm2"]
+        )
+        k4 = batch.batch_k4(arrays["parallel_circuits"], arrays["spacing"],
+                            arrays["install_type"], arrays["core_type"])
+        s = self._section_index(arrays["section_mm2"])
+        grid = self.values[arrays["install_type"], arrays["core_type"], s]
+        return (base_iz * k4)[:, None, None, None] * grid
+
+def compute_grid(temperatures=DEFAULT_TEMPERATURES, resistivities=DEFAULT_RESISTIVITIES,
+                 depths=DEFAULT_DEPTHS, workers=None, chunk_size=8):
+    """
+    Evaluate the Cartesian product of the axes, chunked by temperature.
+    workers: process pool size (None = all cores, 1 = in-process).
+    """
+    temperatures = np.asarray(temperatures, dtype=float)
+    tables = compiled_tables.TABLES
+    chunks = [
+        (temperatures[i:i + chunk_size], resistivities, depths, tables.sections)
+        for i in range(0, len(temperatures), chunk_size)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        slabs = [_grid_chunk(c) for c in chunks]
+    else:
+        # Workers must compute with the active table set, whatever the start method
+        with ProcessPoolExecutor(max_workers=workers, initializer=parallel._init_worker,
+                                 initargs=((tables.raw, tables.name, tables.fingerprint),)) as pool:
+            slabs = list(pool.map(_grid_chunk, chunks))
+    return DeratingGrid(temperatures, resistivities, depths, np.concatenate(slabs, axis=3),
+                        tables.sections, tables.fingerprint)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejilla de factores de corrección K1·K2·K3.")
+    parser.add_argument("output", help="Archivo de salida (.npz)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, todos los núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=8, help="Temperaturas por bloque")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    grid = compute_grid(workers=args.workers, chunk_size=args.chunk_size)
+    grid.save(args.output)
+    print(f"Rejilla {grid.values.shape} guardada en {args.output} ({time.perf_counter() - t0:.2f} s)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# table_pack.py
+# Binary table packs: all IEC tables (ampacity B.2 - B.9, factors B.11 - B.21)
+# in one versioned file that is memory-mapped on load, so worker processes
+# share the same pages. Alternate packs (manufacturer catalogues, other
+# editions of the standard) can be activated at runtime.
+#
+# Usage:
+#   python table_pack.py compile iec60502_2.iecpack
+#   python table_pack.py export catalogo.json
+#   python table_pack.py compile fabricante.iecpack --from catalogo.json
+#   python table_pack.py info iec60502_2.iecpack
+#
+# Catalogue JSON (see "export" for a complete example):
+#   {"name": ..., "description": ...,
+#    "sections": [10, ..., 630],                       optional, sections
+#                                                      offered besides those
+#                                                      in "ampacity"
+#    "ampacity": [{"key": [insulation, conductor, core, install, armour,
+#                          layout], "source": ..., "data": {"630": 812, ...}}],
+#    "B11": {...}, ..., "B21": {...}}                   optional, default: the
+#                                                      tables of data_tables.py
+# Key values are those of ampacity_array.DIMENSIONS (e.g. ["XLPE", "Cu",
+# "Single Core", "Direct", "Unarmoured", "Trefoil"]). Factor tables use the
+# data_tables.py layout with string keys: B11-B13 {x: [v1, v2]}, B14-B17
+# {section: {resistivity: k3}}, B18-B21 {circuits: {spacing: k4 or null}}.
+#
+# File layout (little-endian):
+#   0   8 bytes   magic b"IECPACK\0"
+#   8   uint16    format version
+#   10  uint16    reserved
+#   12  uint32    header length
+#   16  header    UTF-8 JSON: metadata, content hash and array directory
+#   ... arrays    raw C-order data, each aligned to ALIGNMENT bytes; offsets
+#                 in the directory are relative to the first aligned byte
+#                 after the header
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+
+import numpy as np
+import ampacity_array
+import batch
+import compiled_tables
+
+MAGIC = b"IECPACK\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sHHI")
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def compile_pack(path, raw=None, name="IEC 60502-2", description=""):
+    """
+    Write a table pack from a raw table set (default: the tables in
+    data_tables.py). Returns the content hash.
+    """
+    raw = raw or compiled_tables.builtin_tables()
+    sections = list(raw.get("sections") or compiled_tables.table_sections(raw["ampacity"]))
+    arrays = batch.table_arrays(raw)
+    arrays["ampacity"], _ = ampacity_array.build_ampacity_array(raw["ampacity"], sections)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "description": description,
+        "content_hash": compiled_tables.tables_fingerprint(raw),
+        "ampacity_dimensions": ampacity_array.DIMENSIONS,
+        "ampacity_sections": sections,
+        "ampacity_sources": [
+            [list(key), record["source"]] for key, record in raw["ampacity"].items()
+        ],
+        "arrays": {},
+    }
+    # Array offsets are relative to the data section, which starts at the
+    # first aligned position after the header
+    offset = 0
+    for key, arr in arrays.items():
+        header["arrays"][key] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _align(offset + arr.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(_PREFIX.size + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        for key, arr in arrays.items():
+            f.seek(data_start + header["arrays"][key]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    return header["content_hash"]
+
+class TablePack:
+    """A memory-mapped table pack. Arrays are read-only views on the mapping."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, header_len = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es un paquete de tablas.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Versión de paquete {version} no soportada (se esperaba {FORMAT_VERSION}).")
+        self.header = json.loads(self._mmap[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+        data_start = _align(_PREFIX.size + header_len)
+        self.name = self.header["name"]
+        self.content_hash = self.header["content_hash"]
+        self.arrays = {
+            key: np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]),
+                            buffer=self._mmap, offset=data_start + entry["offset"])
+            for key, entry in self.header["arrays"].items()
+        }
+
+    def raw_tables(self):
+        """Rebuild the raw table set (dicts as in data_tables.py)."""
+        a = self.arrays
+        raw = {
+            "sections": self.header["ampacity_sections"],
+            "B11": {float(t): tuple(map(float, row)) for t, row in zip(a["b11_temps"], a["b11_values"])},
+        }
+        for name, values in zip(["B12", "B13"], a["k2_values"]):
+            raw[name] = {float(d): tuple(map(float, row)) for d, row in zip(a["k2_depths"], values)}
+        for name, values in zip(batch.K3_ORDER, a["k3_values"]):
+            raw[name] = {
+                float(s): {float(r): float(v) for r, v in zip(a["k3_resistivities"], row)}
+                for s, row in zip(a["k3_sections"], values)
+            }
+        for name, values in zip(batch.K4_ORDER, a["k4_values"]):
+            raw[name] = {
+                float(c): {float(s): None if np.isnan(v) else float(v) for s, v in zip(a["k4_spacings"], row)}
+                for c, row in zip(a["k4_circuits"], values)
+            }
+
+        dims = self.header["ampacity_dimensions"]
+        sections = self.header["ampacity_sections"]
+        amps = a["ampacity"]
+        raw["ampacity"] = {}
+        for key, source in self.header["ampacity_sources"]:
+            idx = tuple(dim.index(value) for dim, value in zip(dims, key))
+            raw["ampacity"][tuple(key)] = {
+                "source": source,
+                "data": {s: int(v) for s, v in zip(sections, amps[idx]) if v != ampacity_array.MISSING},
+            }
+        return raw
+
+    def compiled(self):
+        """CompiledTables for this pack; the batch path uses the mapped arrays directly."""
+        for names, theirs, ours in zip(DIMENSION_NAMES, self.header["ampacity_dimensions"], ampacity_array.DIMENSIONS):
+            if theirs != ours:
+                raise ValueError(f"El paquete {self.path} usa otros valores de '{names}' ({', '.join(theirs)}); "
+                                 f"la aplicación admite: {', '.join(ours)}.")
+        tables = compiled_tables.CompiledTables(self.raw_tables(), name=self.name, arrays=self.arrays)
+        if tables.fingerprint != self.content_hash:
+            raise ValueError(f"El contenido de {self.path} no coincide con su hash (archivo dañado).")
+        return tables
+
+# --- Catalogues (JSON) ---
+
+DIMENSION_NAMES = ["insulation", "conductor", "core", "install", "armour", "layout"]
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+def _table_from_json(name, table):
+    if name in ("B11", "B12", "B13"):
+        return {_number(x): tuple(float(v) for v in values) for x, values in table.items()}
+    return {
+        _number(x): {_number(y): None if v is None else float(v) for y, v in row.items()}
+        for x, row in table.items()
+    }
+
+def read_catalog(path):
+    """
+    Raw table set from a catalogue JSON file (format in the module header);
+    factor tables not given are taken from data_tables.py.
+    Returns (raw, name, description). Raises ValueError on invalid content.
+    """
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    builtin = compiled_tables.builtin_tables()
+    raw = {}
+    try:
+        for name in compiled_tables.TABLE_NAMES:
+            raw[name] = _table_from_json(name, catalog[name]) if name in catalog else builtin[name]
+        raw["ampacity"] = {}
+        for i, entry in enumerate(catalog["ampacity"]):
+            key = tuple(entry["key"])
+            if len(key) != len(DIMENSION_NAMES):
+                raise ValueError(f"Entrada de ampacidad {i+1}: la clave debe tener {len(DIMENSION_NAMES)} valores.")
+            for name, value, allowed in zip(DIMENSION_NAMES, key, ampacity_array.DIMENSIONS):
+                if value not in allowed:
+                    raise ValueError(f"Entrada de ampacidad {i+1}: '{value}' no es un valor de '{name}' "
+                                     f"({', '.join(allowed)}).")
+            raw["ampacity"][key] = {
+                "source": entry.get("source", catalog.get("name", path)),
+                "data": {_number(s): int(v) for s, v in entry["data"].items()},
+            }
+        listed = {_number(s) for s in catalog.get("sections", [])}
+    except KeyError as e:
+        raise ValueError(f"Falta '{e.args[0]}' en el catálogo {path}.")
+    except (TypeError, AttributeError):
+        raise ValueError(f"El catálogo {path} no tiene el formato esperado.")
+    raw["sections"] = sorted(listed | set(compiled_tables.table_sections(raw["ampacity"])))
+    return raw, catalog.get("name"), catalog.get("description", "")
+
+def write_catalog(path, raw=None, name="IEC 60502-2", description=""):
+    """Write a raw table set (default: data_tables.py) as a catalogue JSON file."""
+    raw = raw or compiled_tables.builtin_tables()
+    catalog = {
+        "name": name,
+        "description": description,
+        "sections": list(raw.get("sections") or compiled_tables.table_sections(raw["ampacity"])),
+        "ampacity": [
+            {"key": list(key), "source": record["source"], "data": record["data"]}
+            for key, record in raw["ampacity"].items()
+        ],
+    }
+    for table in compiled_tables.TABLE_NAMES:
+        catalog[table] = raw[table]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=1, ensure_ascii=False)
+
+def load_pack(path):
+    return TablePack(path)
+
+def use_pack(path):
+    """Load a pack and make it the active table set. Returns its CompiledTables."""
+    return compiled_tables.use_tables(load_pack(path).compiled())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paquetes binarios de tablas IEC 60502-2.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile", help="Compilar las tablas de data_tables.py o de un catálogo")
+    p_compile.add_argument("output")
+    p_compile.add_argument("--from", dest="catalog", help="Catálogo JSON (por defecto, data_tables.py)")
+    p_compile.add_argument("--name", help="Nombre del paquete (por defecto, el del catálogo o IEC 60502-2)")
+    p_compile.add_argument("--description")
+    p_export = sub.add_parser("export", help="Exportar las tablas de data_tables.py como catálogo JSON")
+    p_export.add_argument("output")
+    p_info = sub.add_parser("info", help="Mostrar la cabecera de un paquete")
+    p_info.add_argument("pack")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        raw, name, description = None, None, ""
+        try:
+            if args.catalog:
+                raw, name, description = read_catalog(args.catalog)
+            content_hash = compile_pack(args.output, raw, name=args.name or name or "IEC 60502-2",
+                                        description=args.description if args.description is not None else description)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"{args.catalog or 'data_tables.py'}: {e}")
+        print(f"{args.output}: {content_hash}", file=sys.stderr)
+    elif args.command == "export":
+        write_catalog(args.output)
+        print(f"{args.output}: catálogo de data_tables.py", file=sys.stderr)
+    else:
+        pack = load_pack(args.pack)
+        try:
+            tables = pack.compiled()
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"{pack.name} (formato v{pack.header['format_version']})")
+        print(f"hash: {tables.fingerprint}")
+        for key, arr in pack.arrays.items():
+            print(f"  {key:<18} {arr.dtype.str:<4} {arr.shape}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# test_import_budget.py
+# The calculation core (benchmark.CORE_MODULES) must import within the
+# budget and without NumPy, pandas or Streamlit. Run with: python -m pytest
+
+from benchmark import DEFAULT_IMPORT_BUDGET_MS, HEAVY_MODULES, measure_core_import
+
+def test_core_import_budget():
+    elapsed, heavy = measure_core_import()
+    assert not heavy, f"El núcleo importa {', '.join(heavy)} (prohibidos: {', '.join(HEAVY_MODULES)})"
+    assert elapsed <= DEFAULT_IMPORT_BUDGET_MS, f"Importación del núcleo: {elapsed:.1f} ms (límite {DEFAULT_IMPORT_BUDGET_MS:.0f} ms)"
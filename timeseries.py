@@ -0,0 +1,199 @@
+# timeseries.py
+# Hourly (e.g. 8760 h) evaluation: Ib(t) from hourly power per tramo and
+# Iz'(t) from the hourly ground temperature (K1) as (hours x tramos) arrays.
+# Reports hours in violation, worst hour and margin duration curves.
+#
+# K2, K3, K4 and the base Iz do not depend on time, so they are evaluated
+# once per tramo; Iz'(t) multiplies them in the same order as
+# batch.evaluate_batch, giving the same values as an hour-by-hour run.
+# Tramos are processed in blocks of whole circuits to bound memory.
+#
+# Usage:
+#   python timeseries.py tramos.csv horario.csv resumen.csv
+#
+# tramos.csv as for batch_cli.py (optional "circuit" column); horario.csv
+# has one row per hour, one power column (kVA) per tramo in the order of
+# tramos.csv and a "temp_ground" column (ºC).
+
+import argparse
+import csv
+import sys
+
+import numpy as np
+import batch
+import compiled_tables
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM
+from instrumentation import timed
+
+HOURS_PER_YEAR = 8760
+# Duration curve points: margin exceeded during at least p % of the hours
+DEFAULT_DURATION_POINTS = np.arange(0, 101, 5)
+BLOCK_TRAMOS = 512
+
+def _blocks(counts, size):
+    """(start, end) tramo ranges made of whole circuits, about size tramos each."""
+    ends = np.cumsum(counts)
+    blocks, start = [], 0
+    for end in ends:
+        if end - start >= size:
+            blocks.append((start, int(end)))
+            start = int(end)
+    if ends.size and start < ends[-1]:
+        blocks.append((start, int(ends[-1])))
+    return blocks
+
+@timed("timeseries.timeseries_tramos")
+def timeseries_tramos(arrays, power, temp_ground, site, system, counts=None,
+                      duration_points=DEFAULT_DURATION_POINTS, block=BLOCK_TRAMOS):
+    """
+    Evaluate every tramo at every hour.
+    power: (hours x tramos) power of each tramo (kVA); with counts (tramos
+    per circuit) it is each tramo's own load, accumulated along its circuit
+    like pb_power, otherwise it is the design power itself.
+    temp_ground: (hours,) or (hours x tramos) ground temperature (ºC).
+    Returns dict of arrays:
+      per tramo:  hours_in_violation, worst_hour, worst_margin (A),
+                  max_ib, min_iz_prime
+      per hour:   violations_per_hour (number of tramos with Ib > Iz')
+      duration_curves (points x tramos): margin Iz' - Ib exceeded during at
+                  least p % of the hours, p from duration_points
+    """
+    power = np.asarray(power)
+    hours, n = power.shape
+    temp = np.asarray(temp_ground, dtype=float)
+    if temp.shape not in ((hours,), (hours, n)):
+        raise ValueError(f"La temperatura debe tener {hours} valores horarios.")
+    if counts is None:
+        counts = np.ones(n, dtype=np.int64)
+        cumulative = False
+    else:
+        counts = np.asarray(counts, dtype=np.int64)
+        cumulative = True
+
+    # Time-independent part of Iz'
+    fixed = batch.evaluate_tramos(arrays, np.zeros(n), site, system)
+    base_iz = np.broadcast_to(fixed["base_iz"], (n,))
+    k2, k3, k4 = (np.broadcast_to(fixed[k], (n,)) for k in ("k2", "k3", "k4"))
+    k1 = batch.batch_k1(temp)
+    q = 1 - np.asarray(duration_points, dtype=float) / 100
+
+    out = {
+        "hours_in_violation": np.zeros(n, dtype=np.int64),
+        "worst_hour": np.zeros(n, dtype=np.int64),
+        "worst_margin": np.zeros(n),
+        "max_ib": np.zeros(n),
+        "min_iz_prime": np.zeros(n),
+        "violations_per_hour": np.zeros(hours, dtype=np.int64),
+        "duration_curves": np.zeros((len(q), n)),
+    }
+    for a, b in _blocks(counts, block):
+        p = np.asarray(power[:, a:b], dtype=float)
+        if cumulative:
+            # Running sum restarting at the first tramo of each circuit
+            block_counts = counts[(np.cumsum(counts) > a) & (np.cumsum(counts) <= b)]
+            cs = np.cumsum(p, axis=1)
+            starts = np.cumsum(block_counts) - block_counts
+            before = np.where(starts > 0, cs[:, np.maximum(starts - 1, 0)], 0.0)
+            p = cs - np.repeat(before, block_counts, axis=1)
+        ib = batch.batch_ib(p, system["voltage"], system["pf"], system["oversizing"])
+        k1_block = k1[:, None] if k1.ndim == 1 else k1[:, a:b]
+        iz = base_iz[a:b] * k1_block * k2[a:b] * k3[a:b] * k4[a:b]
+        margin = iz - ib
+        violated = ib > iz
+
+        worst = np.argmin(margin, axis=0)
+        out["hours_in_violation"][a:b] = violated.sum(axis=0)
+        out["worst_hour"][a:b] = worst
+        out["worst_margin"][a:b] = margin[worst, np.arange(b - a)]
+        out["max_ib"][a:b] = ib.max(axis=0)
+        out["min_iz_prime"][a:b] = iz.min(axis=0)
+        out["violations_per_hour"] += violated.sum(axis=1)
+        out["duration_curves"][:, a:b] = np.quantile(margin, q, axis=0)
+    return out
+
+def timeseries_project(circuits, power, temp_ground, site=None, system=None,
+                       duration_points=DEFAULT_DURATION_POINTS):
+    """
+    Hourly evaluation of a project (circuits as in the app session).
+    power: (hours x tramos) own load of each tramo in project order (the
+    hourly counterpart of pb_power); temp_ground: (hours,) ground temperature.
+    Returns {"violations_per_hour": [...], "circuits": [[record, ...], ...]}
+    with records {"hours_in_violation", "worst_hour", "worst_margin",
+    "max_ib", "min_iz_prime", "duration_curve": {p: A}, "tables_hash"}.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    arrays, _, counts = batch.project_arrays(circuits)
+    if arrays is None:
+        return {"violations_per_hour": [0] * len(temp_ground), "circuits": [[] for _ in circuits]}
+    ts = timeseries_tramos(arrays, power, temp_ground, site, system, counts, duration_points)
+
+    fields = ["hours_in_violation", "worst_hour", "worst_margin", "max_ib", "min_iz_prime"]
+    columns = [ts[name].tolist() for name in fields]
+    curves = ts["duration_curves"].T.tolist()
+    points = [float(p) for p in duration_points]
+    tables_hash = compiled_tables.TABLES.fingerprint
+    records = [
+        {**dict(zip(fields, row)), "duration_curve": dict(zip(points, curve)), "tables_hash": tables_hash}
+        for row, curve in zip(zip(*columns), curves)
+    ]
+    return {"violations_per_hour": ts["violations_per_hour"].tolist(),
+            "circuits": batch.split_by_counts(records, counts)}
+
+def main(argv=None):
+    from batch_cli import CIRCUIT_COLUMN, CsvSink, add_site_system_arguments, read_csv_chunks, site_system
+
+    parser = argparse.ArgumentParser(description="Evaluación horaria (8760 h) de carga y temperatura del terreno.")
+    parser.add_argument("tramos", help="CSV de tramos (como batch_cli.py)")
+    parser.add_argument("hourly", help="CSV horario: una columna de potencia por tramo y temp_ground")
+    parser.add_argument("output", help="CSV de resumen por tramo")
+    # Ground temperature comes hour by hour from the hourly CSV
+    add_site_system_arguments(parser, temp_ground=False)
+    args = parser.parse_args(argv)
+
+    columns = {}
+    for chunk in read_csv_chunks(args.tramos, 100_000):
+        for name, values in chunk.items():
+            columns.setdefault(name, []).extend(values)
+    if not columns:
+        raise SystemExit("No hay tramos.")
+    n = len(next(iter(columns.values())))
+    counts = None
+    if CIRCUIT_COLUMN in columns:
+        ids = np.asarray(columns[CIRCUIT_COLUMN])
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        counts = np.diff(np.r_[starts, n])
+
+    with open(args.hourly, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        data = np.array([row for row in reader], dtype=float)
+    if "temp_ground" not in header:
+        raise SystemExit("Falta la columna 'temp_ground' en el CSV horario.")
+    t_col = header.index("temp_ground")
+    power = np.delete(data, t_col, axis=1)
+    if power.shape[1] != n:
+        raise SystemExit(f"El CSV horario tiene {power.shape[1]} columnas de potencia para {n} tramos.")
+
+    site, system = site_system(args)
+    try:
+        arrays = batch.tramo_arrays(columns)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    res = timeseries_tramos(arrays, power, data[:, t_col], site, system, counts)
+
+    out = {"tramo": [name for i, name in enumerate(header) if i != t_col]}
+    for name in ("hours_in_violation", "worst_hour", "worst_margin", "max_ib", "min_iz_prime"):
+        out[name] = res[name].tolist()
+    for p, curve in zip(DEFAULT_DURATION_POINTS, res["duration_curves"]):
+        out[f"margin_p{p}"] = curve.tolist()
+    sink = CsvSink(args.output)
+    try:
+        sink.write(out)
+    finally:
+        sink.close()
+    print(f"{n:,} tramos x {len(data):,} horas; {int(np.sum(res['hours_in_violation'] > 0)):,} tramos con horas en fallo",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# topology.py
+# Radial collector networks: tramos form a tree in which every tramo names
+# its parent, the next tramo towards the point of connection. The design
+# power of a tramo is its own pb_power plus everything downstream of it,
+# aggregated level by level (post-order) in O(n), and then evaluated with
+# the same Ib / K1..K4 pipeline as linear circuits.
+#
+# A linear circuit of the app is the special case of a chain: tramo j is
+# the parent of tramo j-1 and the last tramo connects to the root.
+#
+# Usage:
+#   python topology.py red.csv resultados.csv --voltage 30
+#
+# Input columns: "id", "parent" (empty for tramos connected to the point of
+# connection) and the tramo fields of the app (see batch_cli.py).
+
+import argparse
+import sys
+
+import numpy as np
+import batch
+from engine import DEFAULT_SITE, DEFAULT_SYSTEM
+
+ID_COLUMN = "id"
+PARENT_COLUMN = "parent"
+
+def _is_root(parent):
+    return parent is None or parent == "" or (isinstance(parent, float) and np.isnan(parent))
+
+def parent_index(ids, parents):
+    """
+    Parent positions (-1 for roots) from node ids and parent ids.
+    Raises ValueError on duplicate ids or unknown parents.
+    """
+    position = {}
+    for i, node in enumerate(ids):
+        if node in position:
+            raise ValueError(f"Identificador de tramo duplicado: {node!r}")
+        position[node] = i
+    index = np.empty(len(ids), dtype=np.int64)
+    for i, parent in enumerate(parents):
+        if _is_root(parent):
+            index[i] = -1
+        elif parent in position:
+            index[i] = position[parent]
+        else:
+            raise ValueError(f"El tramo {ids[i]!r} tiene un padre desconocido: {parent!r}")
+    return index
+
+def levels(parent):
+    """
+    Breadth-first levels from the roots: list of node index arrays, level 0
+    being the roots. Raises ValueError if some nodes are in a cycle.
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    n = len(parent)
+    # Children of node p are children[first[p]:first[p + 1]] (CSR layout)
+    has_parent = parent >= 0
+    children = np.flatnonzero(has_parent)[np.argsort(parent[has_parent], kind="stable")]
+    first = np.concatenate([[0], np.cumsum(np.bincount(parent[has_parent], minlength=n))])
+
+    result, visited = [], 0
+    frontier = np.flatnonzero(~has_parent)
+    while len(frontier):
+        result.append(frontier)
+        visited += len(frontier)
+        counts = first[frontier + 1] - first[frontier]
+        # Concatenated ranges first[f]:first[f + 1] for every f in the frontier
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        frontier = children[np.repeat(first[frontier], counts) + offsets]
+    if visited != n:
+        raise ValueError(f"La red contiene ciclos ({n - visited} tramos no conectan con el origen).")
+    return result
+
+def downstream_power(pb_power, parent, node_levels=None):
+    """
+    Design power per node: own pb_power plus the pb_power of every node in
+    its subtree. Leaves are folded into their parents from the deepest
+    level up, so each node is visited once.
+    """
+    parent = np.asarray(parent, dtype=np.int64)
+    power = np.array(pb_power, dtype=float)
+    for nodes in reversed((node_levels or levels(parent))[1:]):
+        np.add.at(power, parent[nodes], power[nodes])
+    return power
+
+def evaluate_tree(tramos, site=None, system=None):
+    """
+    Evaluate a radial network given as a list of tramo dicts with "id" and
+    "parent" keys plus the usual tramo fields.
+    Returns one record per tramo, in input order:
+    {"id", "parent", "depth", "design_power", "ib", "k1".."k4", "base_iz",
+     "iz_prime", "passed", "tables_hash"}
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    if not tramos:
+        return []
+
+    ids = [t[ID_COLUMN] for t in tramos]
+    parents = [t.get(PARENT_COLUMN) for t in tramos]
+    parent = parent_index(ids, parents)
+    node_levels = levels(parent)
+    depth = np.empty(len(parent), dtype=np.int64)
+    for d, nodes in enumerate(node_levels):
+        depth[nodes] = d
+
+    arrays = batch.sections_to_arrays(tramos)
+    design_power = downstream_power(arrays["pb_power"], parent, node_levels)
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+
+    n = len(tramos)
+    fields = ["design_power", "ib", "k1", "k2", "k3", "k4", "base_iz", "iz_prime", "passed"]
+    columns = [np.broadcast_to(res[name], (n,)).tolist() for name in fields]
+    return [
+        {"id": node, "parent": None if _is_root(p) else p, "depth": int(d), **dict(zip(fields, row)),
+         "tables_hash": res["tables_hash"]}
+        for node, p, d, row in zip(ids, parents, depth, zip(*columns))
+    ]
+
+def main(argv=None):
+    from batch_cli import (RESULT_COLUMNS, CsvSink, ParquetSink, _is_parquet, add_site_system_arguments,
+                           read_csv_chunks, read_parquet_chunks, site_system)
+
+    parser = argparse.ArgumentParser(description="Cálculo de ampacidad en redes radiales (árbol de tramos).")
+    parser.add_argument("input", help="CSV o Parquet con columnas id, parent y campos de tramo")
+    parser.add_argument("output", help="CSV o Parquet de resultados")
+    add_site_system_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # The whole network is needed to aggregate downstream power
+    reader = read_parquet_chunks if _is_parquet(args.input) else read_csv_chunks
+    columns = {}
+    for chunk in reader(args.input, 100_000):
+        for name, values in chunk.items():
+            columns.setdefault(name, []).extend(values)
+    if not columns:
+        raise SystemExit("La red está vacía.")
+    for name in (ID_COLUMN, PARENT_COLUMN):
+        if name not in columns:
+            raise SystemExit(f"Falta la columna '{name}'.")
+
+    n = len(columns[ID_COLUMN])
+    try:
+        parent = parent_index(columns[ID_COLUMN], columns[PARENT_COLUMN])
+        arrays = batch.tramo_arrays(columns)
+        design_power = downstream_power(arrays["pb_power"], parent)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    site, system = site_system(args)
+    res = batch.evaluate_tramos(arrays, design_power, site, system)
+
+    out = dict(columns)
+    for name in RESULT_COLUMNS:
+        out[name] = np.broadcast_to(res[name], (n,)).tolist()
+    sink = ParquetSink(args.output) if _is_parquet(args.output) else CsvSink(args.output)
+    try:
+        sink.write(out)
+    finally:
+        sink.close()
+    print(f"{n:,} tramos evaluados ({int(np.sum(~res['passed'])):,} no cumplen)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
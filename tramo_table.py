@@ -0,0 +1,150 @@
+# tramo_table.py
+# Columnar project table: all tramos of a project in one table (dict of
+# columns, e.g. from a DataFrame) with a "circuit" column, as edited by the
+# app's grid editor. Validation and evaluation work on whole columns.
+
+import numpy as np
+import batch
+from data_tables import VALID_SECTIONS
+from engine import DEFAULT_SECTION, DEFAULT_SITE, DEFAULT_SYSTEM
+from instrumentation import timed
+
+CIRCUIT_COLUMN = "circuit"
+TABLE_COLUMNS = [CIRCUIT_COLUMN] + list(DEFAULT_SECTION)
+
+VOLTAGES_U0 = ["3,6/6 (7,2)", "6/10 (12)", "8,7/15 (17,5)", "12/20 (24)", "18/30 (36) kV"]
+
+# Allowed values per categorical column
+ALLOWED_VALUES = {
+    **batch.CATEGORY_COLUMNS,
+    "section_mm2": VALID_SECTIONS,
+    "voltage_u0": VOLTAGES_U0,
+}
+# Numeric columns and their minimum value
+NUMERIC_MINIMUMS = {
+    CIRCUIT_COLUMN: 1,
+    "pb_power": 0.0,
+    "length": 0.0,
+    "parallel_circuits": 1,
+    "veins": 1,
+    "spacing": 0.0,
+    "depth": 0.0,
+}
+# Numeric columns that only take whole numbers
+INTEGER_COLUMNS = {CIRCUIT_COLUMN, "parallel_circuits", "veins"}
+
+def circuits_to_columns(circuits):
+    """Project circuits (app session layout) to table columns; circuits are numbered from 1."""
+    columns = {name: [] for name in TABLE_COLUMNS}
+    for i, circuit in enumerate(circuits):
+        for section in circuit["sections"]:
+            columns[CIRCUIT_COLUMN].append(i + 1)
+            for name, default in DEFAULT_SECTION.items():
+                columns[name].append(section.get(name, default))
+    return columns
+
+def columns_to_circuits(columns):
+    """Table columns back to project circuits, in order of circuit number."""
+    n = len(columns[CIRCUIT_COLUMN])
+    by_circuit = {}
+    for r in range(n):
+        section = {name: _value(columns[name][r]) if name in columns else default
+                   for name, default in DEFAULT_SECTION.items()}
+        circuit = float(columns[CIRCUIT_COLUMN][r])
+        if not circuit.is_integer():
+            raise ValueError(f"Fila {r+1}: número de circuito no entero {circuit!r}")
+        by_circuit.setdefault(int(circuit), []).append(section)
+    return [{"sections": by_circuit[c]} for c in sorted(by_circuit)]
+
+def _value(v):
+    # NumPy scalars (DataFrame cells) to plain Python values
+    return v.item() if isinstance(v, np.generic) else v
+
+def _missing(v):
+    return v is None or v == "" or (isinstance(v, float) and np.isnan(v))
+
+def validate_columns(columns, max_errors=50):
+    """
+    Check every cell against the allowed values and numeric ranges.
+    Returns a list of error messages (empty when the table is valid),
+    with rows numbered from 1.
+    """
+    errors = []
+    n = len(columns[CIRCUIT_COLUMN]) if CIRCUIT_COLUMN in columns else 0
+    for name, allowed in ALLOWED_VALUES.items():
+        if name not in columns:
+            continue
+        allowed_set = set(allowed)
+        for r, v in enumerate(columns[name]):
+            if _value(v) not in allowed_set:
+                errors.append(f"Fila {r+1}, '{name}': valor no permitido {v!r}")
+    for name, minimum in NUMERIC_MINIMUMS.items():
+        if name not in columns:
+            continue
+        for r, v in enumerate(columns[name]):
+            try:
+                bad = _missing(v) or float(v) < minimum
+                if not bad and name in INTEGER_COLUMNS and not float(v).is_integer():
+                    errors.append(f"Fila {r+1}, '{name}': se esperaba un número entero ({v!r})")
+                    continue
+            except (TypeError, ValueError):
+                bad = True
+            if bad:
+                errors.append(f"Fila {r+1}, '{name}': se esperaba un número ≥ {minimum} ({v!r})")
+    if n and CIRCUIT_COLUMN not in columns:
+        errors.append(f"Falta la columna '{CIRCUIT_COLUMN}'")
+    return errors[:max_errors]
+
+def design_power(pb_power, circuit):
+    """
+    pb_power accumulated along each circuit in row order (rows of a
+    circuit need not be contiguous); each circuit's running sum starts
+    from zero, as in engine.evaluate_project.
+    """
+    pb_power = np.asarray(pb_power, dtype=float)
+    circuit = np.asarray(circuit)
+    order = np.argsort(circuit, kind="stable")
+    p = pb_power[order]
+    c = circuit[order]
+    starts = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+    ends = np.r_[starts[1:], len(p)]
+    grouped = np.empty_like(p)
+    for a, b in zip(starts, ends):
+        grouped[a:b] = np.cumsum(p[a:b])
+    out = np.empty_like(p)
+    out[order] = grouped
+    return out
+
+@timed("tramo_table.table_arrays")
+def table_arrays(columns):
+    """
+    batch.tramo_arrays() for a project table plus the design power of each
+    row. Raises ValueError on invalid category values.
+    """
+    arrays = batch.tramo_arrays(columns)
+    power = design_power(arrays["pb_power"], np.asarray(columns[CIRCUIT_COLUMN], dtype=np.int64))
+    return arrays, power
+
+def grouped_arrays(columns):
+    """
+    Table rows grouped by circuit for the per-circuit analyses (sizing,
+    capacity, losses, Monte Carlo). A stable sort on the circuit column
+    keeps the row order of the tramos within each circuit.
+    Returns (arrays, design_power, tramos per circuit, circuit numbers).
+    """
+    arrays, power = table_arrays(columns)
+    circuit = np.asarray(columns[CIRCUIT_COLUMN], dtype=np.int64)
+    order = np.argsort(circuit, kind="stable")
+    numbers, counts = np.unique(circuit[order], return_counts=True)
+    return {name: values[order] for name, values in arrays.items()}, power[order], counts, numbers.tolist()
+
+def evaluate_columns(columns, site=None, system=None):
+    """
+    Evaluate a project table without converting it to per-tramo dicts.
+    Returns batch.evaluate_tramos() arrays (design_power, ib, k1..k4,
+    base_iz, iz_prime, passed, tables_hash) in row order.
+    """
+    site = {**DEFAULT_SITE, **(site or {})}
+    system = {**DEFAULT_SYSTEM, **(system or {})}
+    arrays, power = table_arrays(columns)
+    return batch.evaluate_tramos(arrays, power, site, system)